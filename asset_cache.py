@@ -0,0 +1,162 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+import tempfile
+import time
+
+# Shared by every run, next to output_videos/
+CACHE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+
+# Last-use times of a store's files, kept beside them rather than in their
+# mtime: cached files are hard linked into run folders, and touching the
+# shared inode would change the run copy's timestamps too
+ACCESS_INDEX = ".access.json"
+
+def cache_key(*parts):
+    """Stable content hash of any JSON-serialisable inputs"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def link_or_copy(src, dest):
+    """Hard link src to dest, copying when linking isn't possible (e.g. across drives)"""
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+class AssetCache:
+    """
+    Content-addressed file store with a size cap and LRU eviction.
+
+    Files are stored as <key><suffix>. A hit records its time in the store's
+    access index, so eviction removes the least recently used files first
+    (files the index doesn't know yet count from when they were stored).
+    Hits and misses are counted per instance, which makes one instance per
+    run a run report.
+
+    An entry can carry companion files, <key><other suffix> (see
+    companion_path); they share the entry's recency and are evicted with it.
+    """
+
+    def __init__(self, name, max_bytes, suffix=''):
+        self.name = name
+        self.directory = os.path.join(CACHE_ROOT, name)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def companion_path(self, key, suffix):
+        """Path of a file stored alongside the entry for key, e.g. its metadata"""
+        return os.path.join(self.directory, key + suffix)
+
+    def _read_access(self):
+        try:
+            with open(os.path.join(self.directory, ACCESS_INDEX), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_access(self, access):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(access, f)
+            os.replace(temp_path, os.path.join(self.directory, ACCESS_INDEX))
+        except OSError as e:
+            print(f"Could not update the {self.name} cache index: {e}")
+
+    def _mark_used(self, name):
+        """Record name as used now in the access index (caller holds the lock)"""
+        access = self._read_access()
+        access[name] = time.time()
+        self._write_access(access)
+
+    def get(self, key, companions=()):
+        """Path of the cached file for key, or None on a miss (also when a companion is missing)"""
+        path = self.path_for(key)
+        with self._lock:
+            if os.path.exists(path) and all(os.path.exists(self.companion_path(key, suffix))
+                                            for suffix in companions):
+                self._mark_used(os.path.basename(path))
+                self.hits += 1
+                return path
+            self.misses += 1
+            return None
+
+    def put(self, key, src_path):
+        """Store a copy of src_path under key and return the cached path"""
+        path = self.path_for(key)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        os.remove(temp_path)
+        link_or_copy(src_path, temp_path)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._mark_used(os.path.basename(path))
+        self.evict()
+        return path
+
+    def put_bytes(self, key, data):
+        """Store raw bytes under key and return the cached path"""
+        path = self.path_for(key)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._mark_used(os.path.basename(path))
+        self.evict()
+        return path
+
+    def link_to(self, key, dest):
+        """Place the cached file for key at dest, sharing storage when possible"""
+        link_or_copy(self.path_for(key), dest)
+        return dest
+
+    def total_bytes(self):
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory)
+                   if entry.is_file() and entry.name != ACCESS_INDEX)
+
+    def evict(self):
+        """Remove least recently used files until the store fits max_bytes"""
+        with self._lock:
+            access = self._read_access()
+            # Group each key's files (the entry and its companions) into one entry
+            groups = {}
+            for entry in os.scandir(self.directory):
+                if not entry.is_file() or entry.name.endswith('.tmp') or entry.name == ACCESS_INDEX:
+                    continue
+                group = groups.setdefault(entry.name.split('.', 1)[0], [0, 0, []])
+                group[0] = max(group[0], access.get(entry.name, entry.stat().st_mtime))
+                group[1] += entry.stat().st_size
+                group[2].append(entry.path)
+            total = sum(size for _, size, _ in groups.values())
+            for _, size, paths in sorted(groups.values()):
+                if total <= self.max_bytes:
+                    break
+                for path in paths:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total -= size
+            present = {os.path.basename(path) for _, _, paths in groups.values()
+                       for path in paths if os.path.exists(path)}
+            if set(access) - present:
+                self._write_access({name: used for name, used in access.items() if name in present})
+
+    def report(self):
+        lookups = self.hits + self.misses
+        hit_rate = 100 * self.hits / lookups if lookups else 0
+        return (f"{self.name} cache: {self.hits} hits, {self.misses} misses "
+                f"({hit_rate:.0f}% hit rate), {self.total_bytes() / 1e6:.1f} MB stored")
@@ -0,0 +1,53 @@
+import numpy as np
+from audio_utils import AUDIO_FPS, encode_audio
+
+def speech_envelope(voice, fps=AUDIO_FPS, window=0.05, threshold_db=-40, smoothing=0.25):
+    """
+    0..1 curve that rises while the narrator is speaking.
+
+    Speech is detected per `window` seconds by RMS level, then smoothed over
+    `smoothing` seconds so the music doesn't pump between words.
+    """
+    mono = voice.mean(axis=1)
+    hop = max(1, int(window * fps))
+    n_windows = -(-len(mono) // hop)
+    padded = np.zeros(n_windows * hop, dtype=np.float32)
+    padded[:len(mono)] = mono
+    levels = np.sqrt(np.mean(padded.reshape(n_windows, hop) ** 2, axis=1))
+    speaking = (levels > 10 ** (threshold_db / 20)).astype(np.float32)
+
+    kernel_size = max(1, int(smoothing / window))
+    speaking = np.convolve(speaking, np.ones(kernel_size) / kernel_size, mode='same')
+    return np.repeat(speaking, hop)[:len(mono)]
+
+def fade_curve(n_samples, fps=AUDIO_FPS, fade_in=0.0, fade_out=0.0):
+    curve = np.ones(n_samples, dtype=np.float32)
+    n_in = min(int(fade_in * fps), n_samples)
+    n_out = min(int(fade_out * fps), n_samples)
+    if n_in:
+        curve[:n_in] = np.linspace(0, 1, n_in)
+    if n_out:
+        curve[-n_out:] *= np.linspace(1, 0, n_out)
+    return curve
+
+def mix_audio(voice, output_path, music=None, voice_gain=1.0, music_gain=0.1,
+              duck=False, duck_gain=0.4, music_fade_in=0.5, music_fade_out=1.0, fps=AUDIO_FPS):
+    """
+    Mix narration and background music into one encoded track.
+
+    `voice` and `music` are float (n, 2) arrays at `fps`; music should be
+    looped to the narration length already (see MusicLibrary.samples_for).
+    With `duck`, music drops to duck_gain of its level while the narrator
+    speaks. The mix is encoded once to output_path (AAC for .m4a) so the
+    muxer can copy it as is.
+    """
+    mix = voice * voice_gain
+
+    if music is not None:
+        music = music[:len(voice)]
+        gain = music_gain * fade_curve(len(music), fps, music_fade_in, music_fade_out)
+        if duck:
+            gain *= 1 - (1 - duck_gain) * speech_envelope(voice[:len(music)], fps)
+        mix[:len(music)] += music * gain[:, None]
+
+    return encode_audio(mix, output_path, fps, bitrate="192k")
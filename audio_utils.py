@@ -0,0 +1,46 @@
+import subprocess
+import numpy as np
+from moviepy.config import get_setting
+
+AUDIO_FPS = 44100
+
+def decode_audio(path, fps=AUDIO_FPS):
+    """Decode any audio file to a float32 (n_samples, 2) array in [-1, 1]"""
+    cmd = [get_setting("FFMPEG_BINARY"), "-v", "error", "-i", path,
+           "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "2", "-ar", str(fps), "-"]
+    raw = subprocess.run(cmd, check=True, stdout=subprocess.PIPE).stdout
+    return np.frombuffer(raw, dtype=np.float32).reshape(-1, 2)
+
+def encode_audio(samples, path, fps=AUDIO_FPS, bitrate=None):
+    """Encode a float (n_samples, 2) array; the format follows the file extension"""
+    cmd = [get_setting("FFMPEG_BINARY"), "-y", "-v", "error",
+           "-f", "f32le", "-ac", "2", "-ar", str(fps), "-i", "-"]
+    if bitrate:
+        cmd += ["-b:a", bitrate]
+    cmd.append(path)
+    data = np.ascontiguousarray(np.clip(samples, -1, 1), dtype=np.float32).tobytes()
+    subprocess.run(cmd, input=data, check=True)
+    return path
+
+def rms(samples):
+    return float(np.sqrt(np.mean(np.square(samples, dtype=np.float64)))) if len(samples) else 0.0
+
+def trim_silence(samples, fps=AUDIO_FPS, threshold_db=-50, margin=0.03):
+    """Cut leading and trailing silence, keeping `margin` seconds around the sound"""
+    level = np.abs(samples).max(axis=1)
+    loud = np.flatnonzero(level > 10 ** (threshold_db / 20))
+    if not len(loud):
+        return samples[:0]
+    pad = int(margin * fps)
+    return samples[max(0, loud[0] - pad):loud[-1] + pad + 1]
+
+def apply_fades(samples, fps=AUDIO_FPS, fade_in=0.005, fade_out=0.005):
+    """Short linear fades at both ends so joins don't click"""
+    samples = np.array(samples, dtype=np.float32)
+    n_in = min(int(fade_in * fps), len(samples))
+    n_out = min(int(fade_out * fps), len(samples))
+    if n_in:
+        samples[:n_in] *= np.linspace(0, 1, n_in, dtype=np.float32)[:, None]
+    if n_out:
+        samples[-n_out:] *= np.linspace(1, 0, n_out, dtype=np.float32)[:, None]
+    return samples
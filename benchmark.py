@@ -0,0 +1,249 @@
+"""
+Offline render benchmark.
+
+Renders create_video over a grid of narration lengths, image counts and
+caption densities with synthetic images and a generated narration track, so
+no OpenAI call is made. Each case runs in a fresh process so its peak memory
+is its own. Results go to benchmarks/results_<timestamp>.json and are compared
+with benchmarks/baseline.json when one exists; a case that got slower, renders
+fewer frames per second or uses more memory than the tolerance allows is
+flagged and the exit status is 1.
+
+    python benchmark.py                                  # 15/30/60/90s, 6 images
+    python benchmark.py --durations 30 --image-counts 3 10 --caption-densities 1.5 4
+    python benchmark.py --save-baseline                  # store this run as the baseline
+"""
+import os
+import sys
+import json
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import itertools
+import numpy as np
+from PIL import Image
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from audio_utils import AUDIO_FPS, encode_audio
+from instrumentation import collect
+from music_library import MusicLibrary
+from image_prep import prepare_image
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+IMAGE_SIZE = (1024, 1792)  # width, height of the DALL-E images we render
+DEFAULT_TOLERANCE = 0.15
+
+WORDS = ("health habits sleep water walking sunlight protein fiber stretch breathe balance "
+         "energy focus morning routine small steps every day matters more than you think").split()
+
+def synthetic_images(count, directory, size=IMAGE_SIZE, seed=0):
+    """
+    Write `count` gradient-and-noise PNGs, detailed enough to keep the encoder
+    honest, and prepare them for rendering the way get_images does
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    width, height = size
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    paths = []
+    for i in range(count):
+        base = rng.uniform(0, 255, 3)
+        image = np.stack([base[0] * xx / width, base[1] * yy / height,
+                          np.full_like(xx, base[2])], -1)
+        image += rng.normal(0, 12, image.shape)
+        path = os.path.join(directory, f"image_{i}.png")
+        Image.fromarray(np.clip(image, 0, 255).astype(np.uint8)).save(path)
+        prepare_image(path)
+        paths.append(path)
+    return paths
+
+def narration_track(duration, path, kind='tone'):
+    """A narration stand-in: a 220 Hz tone pulsing like speech, or silence"""
+    t = np.arange(int(duration * AUDIO_FPS)) / AUDIO_FPS
+    if kind == 'silence':
+        samples = np.zeros_like(t)
+    else:
+        # Syllable-like bursts with short pauses, so ducking has something to follow
+        samples = 0.3 * np.sin(2 * np.pi * 220 * t) * (np.sin(2 * np.pi * 2.5 * t) > -0.3)
+    return encode_audio(np.stack([samples, samples], 1), path)
+
+def synthetic_script(duration, words_per_second, seed=0):
+    """A script with about words_per_second * duration words, in 12 word sentences"""
+    rng = random.Random(seed)
+    words = [rng.choice(WORDS) for _ in range(max(1, round(duration * words_per_second)))]
+    sentences = [' '.join(words[i:i + 12]).capitalize() + '.' for i in range(0, len(words), 12)]
+    return ' '.join(sentences)
+
+def case_name(duration, image_count, density):
+    return f"{duration:g}s_{image_count}img_{density:g}wps"
+
+def render_case(images, audio_path, script_text, output_dir, options, seed=0):
+    """Render one case; runs in a worker process (see collect)"""
+    from video_creation import create_video
+    random.seed(seed)
+    return create_video(images, script_text, output_dir, "Benchmark Title", audio_path=audio_path,
+                        **options)
+
+def run_case(duration, image_count, density, work_dir, options, narration='tone'):
+    images_dir = os.path.join(work_dir, f"images_{image_count}")
+    images = sorted(os.path.join(images_dir, f) for f in os.listdir(images_dir) if f.endswith('.png')) \
+        if os.path.isdir(images_dir) else synthetic_images(image_count, images_dir)
+    audio_path = os.path.join(work_dir, f"narration_{duration:g}.mp3")
+    if not os.path.exists(audio_path):
+        narration_track(duration, audio_path, narration)
+    output_dir = os.path.join(work_dir, case_name(duration, image_count, density))
+    os.makedirs(output_dir, exist_ok=True)
+
+    # A fresh process per case, so peak RSS isn't carried over from the one before
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        video_path, metrics = pool.submit(collect, render_case, images, audio_path,
+                                          synthetic_script(duration, density), output_dir,
+                                          options).result()
+
+    timings, counters = metrics['timings'], metrics['counters']
+    frames = counters.get('render.frames', 0)
+    # One timing per encoded segment; with render workers the segments run at
+    # the same time, so the longest one is how long rendering the frames took
+    frame_seconds = max(timings.get('render.frames', []), default=0)
+    wall = sum(timings.get('stage.render', []))
+    result = {
+        'duration': duration,
+        'images': image_count,
+        'caption_density': density,
+        'frames': frames,
+        'wall_seconds': round(wall, 3),
+        'render_fps': round(frames / frame_seconds, 2) if frame_seconds else None,
+        'wall_fps': round(frames / wall, 2) if wall else None,
+        'audio_seconds': round(sum(timings.get('render.audio', [])), 3),
+        'setup_seconds': round(sum(timings.get('render.setup', [])), 3),
+        'encode_seconds': round(sum(timings.get('render.encode', [])), 3),
+        'peak_rss_bytes': metrics['peak_rss_bytes'],
+        'output_bytes': os.path.getsize(video_path),
+    }
+    os.remove(video_path)
+    return result
+
+# For each metric: which direction is a regression
+REGRESSION_CHECKS = {
+    'wall_seconds': 'higher',
+    'render_fps': 'lower',
+    'peak_rss_bytes': 'higher',
+}
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Cases that regressed against the baseline: [(case, metric, baseline, now, change)]"""
+    regressions = []
+    for name, result in results['cases'].items():
+        previous = baseline['cases'].get(name)
+        if not previous:
+            continue
+        for metric, worse in REGRESSION_CHECKS.items():
+            before, now = previous.get(metric), result.get(metric)
+            if not before or now is None:
+                continue
+            change = (now - before) / before
+            if (worse == 'higher' and change > tolerance) or (worse == 'lower' and change < -tolerance):
+                regressions.append((name, metric, before, now, change))
+    return regressions
+
+def environment():
+    """What the numbers depend on besides the code"""
+    library = MusicLibrary()
+    library.refresh()
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'music_tracks': len(library.tracks),
+    }
+
+def print_table(results, baseline=None):
+    print(f"\n{'case':24} {'wall s':>8} {'render fps':>10} {'peak MB':>8} {'output MB':>9}")
+    for name, result in results['cases'].items():
+        line = (f"{name:24} {result['wall_seconds']:8.1f} {result['render_fps'] or 0:10.1f} "
+                f"{(result['peak_rss_bytes'] or 0) / 1e6:8.0f} {result['output_bytes'] / 1e6:9.1f}")
+        previous = baseline and baseline['cases'].get(name)
+        if previous and previous.get('wall_seconds'):
+            line += f"   ({100 * (result['wall_seconds'] / previous['wall_seconds'] - 1):+.0f}% wall)"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline create_video benchmark with synthetic assets')
+    parser.add_argument('--durations', type=float, nargs='+', default=[15, 30, 60, 90],
+                        help='Narration lengths in seconds')
+    parser.add_argument('--image-counts', type=int, nargs='+', default=[6],
+                        help='Number of images per video')
+    parser.add_argument('--caption-densities', type=float, nargs='+', default=[2.5],
+                        help='Script words per second of narration (2.5 is a normal speaking rate)')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Render every case this many times and keep the fastest')
+    parser.add_argument('--narration', choices=['tone', 'silence'], default='tone',
+                        help='Stand-in for the TTS narration')
+    parser.add_argument('--preview', action='store_true', help='Benchmark preview renders')
+    parser.add_argument('--render-workers', type=int, default=1)
+    parser.add_argument('--frame-threads', type=int, default=2)
+    parser.add_argument('--encoder-preset', default=None)
+    parser.add_argument('--crf', type=int, default=None)
+    parser.add_argument('--encoder-threads', type=int, default=None)
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline results to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Relative change allowed before a case counts as a regression')
+    args = parser.parse_args()
+
+    options = dict(preview=args.preview, render_workers=args.render_workers,
+                   frame_threads=args.frame_threads,
+                   encoder={'preset': args.encoder_preset, 'crf': args.crf,
+                            'threads': args.encoder_threads})
+    results = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'options': dict(options, narration=args.narration, repeat=args.repeat),
+        'cases': {},
+    }
+
+    work_dir = tempfile.mkdtemp(prefix="benchmark_")
+    try:
+        for duration, image_count, density in itertools.product(
+                args.durations, args.image_counts, args.caption_densities):
+            name = case_name(duration, image_count, density)
+            runs = []
+            for attempt in range(args.repeat):
+                print(f"\n=== {name} (run {attempt + 1}/{args.repeat}) ===")
+                runs.append(run_case(duration, image_count, density, work_dir, options, args.narration))
+            results['cases'][name] = min(runs, key=lambda run: run['wall_seconds'])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    results_path = os.path.join(BENCHMARK_DIR, f"results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(results_path, 'w') as f:
+        json.dump(results, f, indent=4)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if baseline['options'] != results['options'] or baseline['environment'] != results['environment']:
+            print("\nWarning: the baseline was recorded with other options or on another machine")
+
+    print_table(results, baseline)
+    print("\nResults saved to:", results_path)
+
+    regressions = compare(results, baseline, args.tolerance) if baseline else []
+    for name, metric, before, now, change in regressions:
+        print(f"REGRESSION {name}: {metric} {before} -> {now} ({100 * change:+.0f}%)")
+
+    if args.save_baseline:
+        shutil.copyfile(results_path, args.baseline)
+        print("Saved as baseline:", args.baseline)
+    elif baseline and not regressions:
+        print(f"No regressions against the baseline (tolerance {100 * args.tolerance:.0f}%)")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import os
+import math
+from functools import lru_cache
+from typing import NamedTuple
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from compositing import RGBALayer
+
+# Tried in order; Pillow also searches the system font folders for bare names.
+# Set CAPTION_FONT to a .ttf path to override.
+FONT_CANDIDATES = [
+    'verdanab.ttf',           # Windows
+    'Verdana Bold.ttf',       # macOS
+    'DejaVuSans-Bold.ttf',    # most Linux distros
+    'LiberationSans-Bold.ttf',
+    'arialbd.ttf',
+]
+
+class TextStyle(NamedTuple):
+    font_size: int
+    fill: str
+    stroke_fill: str
+    stroke_width: int
+
+# Sizes are at output resolution. They match the old ImageMagick clips, which
+# were drawn 3x larger on a 3240x3840 canvas and then shrunk by 0.27 / 0.3.
+CAPTION_STYLE = TextStyle(font_size=54, fill='#40E0D0', stroke_fill='black', stroke_width=3)
+TITLE_STYLE = TextStyle(font_size=120, fill='#40E0D0', stroke_fill='black', stroke_width=7)
+
+def scale_style(style, scale):
+    """Style for a frame `scale` times the output resolution (e.g. previews)"""
+    if scale == 1:
+        return style
+    return style._replace(font_size=max(1, round(style.font_size * scale)),
+                          stroke_width=round(style.stroke_width * scale))
+
+@lru_cache(maxsize=None)
+def load_font(font_size):
+    """Load the caption font at a given pixel size"""
+    candidates = [os.getenv('CAPTION_FONT')] + FONT_CANDIDATES
+    for font_name in candidates:
+        if not font_name:
+            continue
+        try:
+            return ImageFont.truetype(font_name, font_size)
+        except OSError:
+            continue
+    raise OSError("No caption font found. Set CAPTION_FONT to the path of a bold .ttf font")
+
+def wrap_text(text, font, max_width):
+    """Word-wrap each line of text so it fits within max_width pixels"""
+    measure = ImageDraw.Draw(Image.new('L', (1, 1)))
+    lines = []
+    for paragraph in text.split('\n'):
+        current_line = []
+        for word in paragraph.split():
+            candidate = ' '.join(current_line + [word])
+            if current_line and measure.textlength(candidate, font=font) > max_width:
+                lines.append(' '.join(current_line))
+                current_line = [word]
+            else:
+                current_line.append(word)
+        lines.append(' '.join(current_line))
+    return '\n'.join(lines)
+
+@lru_cache(maxsize=512)
+def render_text(text, style, size):
+    """
+    Draw outlined, centered text for a canvas of `size` (width, height).
+
+    Returns (rgba, (x, y)): a read-only RGBA array cropped to the text, and
+    where its top-left corner sits inside the canvas. Results are cached by
+    (text, style, size), so repeated captions and re-renders are free.
+    """
+    canvas_w, canvas_h = size
+    font = load_font(style.font_size)
+    wrapped = wrap_text(text, font, canvas_w - 2 * style.stroke_width)
+
+    measure = ImageDraw.Draw(Image.new('L', (1, 1)))
+    x0, y0, x1, y1 = measure.multiline_textbbox(
+        (0, 0), wrapped, font=font, align='center', stroke_width=style.stroke_width)
+    x0, y0, x1, y1 = math.floor(x0), math.floor(y0), math.ceil(x1), math.ceil(y1)
+    text_w, text_h = max(1, x1 - x0), max(1, y1 - y0)
+
+    layer = Image.new('RGBA', (text_w, text_h), (0, 0, 0, 0))
+    ImageDraw.Draw(layer).multiline_text(
+        (-x0, -y0), wrapped, font=font, fill=style.fill, align='center',
+        stroke_width=style.stroke_width, stroke_fill=style.stroke_fill)
+
+    rgba = np.asarray(layer)
+    rgba.flags.writeable = False
+    return rgba, ((canvas_w - text_w) // 2, (canvas_h - text_h) // 2)
+
+def create_text_layer(text, style, canvas_size, canvas_pos, start, duration, fade_in=0.0, fade_out=0.0):
+    """
+    Create a positioned timeline layer of outlined text.
+
+    canvas_pos is the top-left corner, in frame pixels, of the canvas the text
+    is centered in; the layer itself only covers the text.
+    """
+    rgba, (offset_x, offset_y) = render_text(text, style, canvas_size)
+    return RGBALayer(rgba, (canvas_pos[0] + offset_x, canvas_pos[1] + offset_y), start, duration,
+                     fade_in=fade_in, fade_out=fade_out)
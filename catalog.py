@@ -0,0 +1,257 @@
+import os
+import json
+import sqlite3
+import argparse
+from datetime import datetime
+from contextlib import contextmanager
+
+OUTPUT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output_videos")
+CATALOG_PATH = os.getenv('CATALOG_PATH', os.path.join(OUTPUT_ROOT, "catalog.sqlite"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_dir TEXT PRIMARY KEY,
+    idea TEXT,
+    title TEXT,
+    status TEXT NOT NULL DEFAULT 'running',  -- running, failed or done
+    last_stage TEXT,
+    failed_stage TEXT,
+    error TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS assets (
+    path TEXT PRIMARY KEY,
+    run_dir TEXT NOT NULL REFERENCES runs(run_dir),
+    kind TEXT NOT NULL,                      -- image, audio, video or preview
+    render_seconds REAL,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    video_path TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    run_dir TEXT NOT NULL REFERENCES runs(run_dir),
+    status TEXT NOT NULL,                    -- published or failed
+    media_id TEXT,
+    url TEXT,
+    error TEXT,
+    updated_at TEXT,
+    PRIMARY KEY (video_path, platform)
+);
+CREATE INDEX IF NOT EXISTS runs_status ON runs(status, failed_stage);
+CREATE INDEX IF NOT EXISTS assets_run ON assets(run_dir, kind, created_at);
+CREATE INDEX IF NOT EXISTS uploads_run ON uploads(run_dir, platform, status);
+"""
+
+def now():
+    return datetime.now().isoformat(timespec='seconds')
+
+class Catalog:
+    """
+    SQLite index of runs, their assets and where each video was published.
+
+    Pipeline stages write to it as they go, so questions like "which videos
+    aren't on Instagram yet" are an indexed query instead of a walk over
+    every run folder. The run folders stay the source of truth; `import_runs`
+    rebuilds the catalog from them. Each call opens its own short
+    connection, so threads and processes can share one catalog file.
+    """
+
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")  # safe with WAL, far fewer fsyncs
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def record_run(self, run_dir, idea=None, title=None, created_at=None):
+        run_dir = os.path.abspath(run_dir)
+        with self._connect() as db:
+            db.execute("""
+                INSERT INTO runs (run_dir, idea, title, created_at, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(run_dir) DO UPDATE SET
+                    idea = COALESCE(excluded.idea, idea),
+                    title = COALESCE(excluded.title, title),
+                    updated_at = excluded.updated_at
+            """, (run_dir, idea, title, created_at or now(), now()))
+
+    def set_status(self, run_dir, status, stage=None, error=None):
+        run_dir = os.path.abspath(run_dir)
+        self.record_run(run_dir)
+        with self._connect() as db:
+            if status == 'failed':
+                db.execute("UPDATE runs SET status = 'failed', failed_stage = ?, error = ?, updated_at = ? "
+                           "WHERE run_dir = ?", (stage, error, now(), run_dir))
+            else:
+                db.execute("UPDATE runs SET status = ?, last_stage = COALESCE(?, last_stage), "
+                           "failed_stage = NULL, error = NULL, updated_at = ? WHERE run_dir = ?",
+                           (status, stage, now(), run_dir))
+
+    @contextmanager
+    def stage(self, run_dir, name, final=False):
+        """Mark a pipeline stage as running, then done or failed with its error"""
+        self.set_status(run_dir, 'running', name)
+        try:
+            yield
+        except Exception as e:
+            self.set_status(run_dir, 'failed', name, str(e))
+            raise
+        self.set_status(run_dir, 'done' if final else 'running', name)
+
+    def record_assets(self, run_dir, kind, paths, render_seconds=None, created_at=None):
+        run_dir = os.path.abspath(run_dir)
+        self.record_run(run_dir)
+        with self._connect() as db:
+            db.executemany("""
+                INSERT INTO assets (path, run_dir, kind, render_seconds, created_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    kind = excluded.kind,
+                    render_seconds = COALESCE(excluded.render_seconds, render_seconds),
+                    created_at = excluded.created_at
+            """, [(os.path.abspath(path), run_dir, kind, render_seconds, created_at or now())
+                  for path in paths])
+
+    def record_uploads(self, run_dir, video_path, results):
+        """Store publish() results: {platform: {status, id, url, error, ...}}"""
+        run_dir = os.path.abspath(run_dir)
+        self.record_run(run_dir)
+        with self._connect() as db:
+            db.executemany("""
+                INSERT OR REPLACE INTO uploads
+                    (video_path, platform, run_dir, status, media_id, url, error, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(os.path.abspath(video_path), platform, run_dir, record['status'], record.get('id'),
+                   record.get('url'), record.get('error'), record.get('finished_at') or now())
+                  for platform, record in results.items()])
+
+    def newest_video(self, run_dir):
+        with self._connect() as db:
+            row = db.execute("SELECT path FROM assets WHERE run_dir = ? AND kind = 'video' "
+                             "ORDER BY created_at DESC LIMIT 1", (os.path.abspath(run_dir),)).fetchone()
+        return row['path'] if row else None
+
+    def unpublished(self, platforms):
+        """Newest video of every run that isn't published on all of `platforms`"""
+        marks = ','.join('?' * len(platforms))
+        with self._connect() as db:
+            return [dict(row) for row in db.execute(f"""
+                SELECT r.run_dir, r.title, v.path AS video_path,
+                       (SELECT group_concat(u.platform) FROM uploads u
+                        WHERE u.video_path = v.path AND u.status = 'published') AS published_on
+                FROM runs r
+                JOIN assets v ON v.run_dir = r.run_dir AND v.kind = 'video'
+                    AND v.created_at = (SELECT max(created_at) FROM assets
+                                        WHERE run_dir = r.run_dir AND kind = 'video')
+                WHERE (SELECT count(*) FROM uploads u
+                       WHERE u.video_path = v.path AND u.status = 'published'
+                       AND u.platform IN ({marks})) < ?
+                ORDER BY r.run_dir
+            """, (*platforms, len(platforms)))]
+
+    def failed(self, stage=None):
+        """Runs whose last attempt failed, optionally only in one stage"""
+        query = "SELECT run_dir, idea, title, failed_stage, error, updated_at FROM runs WHERE status = 'failed'"
+        params = ()
+        if stage:
+            query += " AND failed_stage = ?"
+            params = (stage,)
+        with self._connect() as db:
+            return [dict(row) for row in db.execute(query + " ORDER BY run_dir", params)]
+
+    def runs(self, limit=50):
+        with self._connect() as db:
+            return [dict(row) for row in db.execute(
+                "SELECT run_dir, title, status, last_stage, failed_stage, updated_at FROM runs "
+                "ORDER BY run_dir DESC LIMIT ?", (limit,))]
+
+    def import_runs(self, root=OUTPUT_ROOT):
+        """Index every existing run folder under root; safe to run again"""
+        count = 0
+        for name in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+            run_dir = os.path.join(root, name)
+            content_path = os.path.join(run_dir, "content.json")
+            if not os.path.isfile(content_path):
+                continue
+            with open(content_path, 'r') as f:
+                content = json.load(f)
+            created = datetime.fromtimestamp(os.path.getmtime(content_path)).isoformat(timespec='seconds')
+            self.record_run(run_dir, title=content.get('title'), created_at=created)
+
+            def files(directory, extensions, prefix=''):
+                if not os.path.isdir(directory):
+                    return []
+                return [os.path.join(directory, f) for f in sorted(os.listdir(directory))
+                        if f.endswith(extensions) and f.startswith(prefix)]
+
+            def mtime(path):
+                return datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec='seconds')
+
+            images = files(os.path.join(run_dir, "images"), ('.png', '.jpg', '.jpeg'))
+            self.record_assets(run_dir, 'image', images, created_at=created)
+            self.record_assets(run_dir, 'audio', files(run_dir, ('.mp3',), 'tts_audio'), created_at=created)
+            videos = [v for v in files(run_dir, ('.mp4', '.mov', '.avi')) if not os.path.basename(v).startswith('preview_')]
+            for video in videos:
+                self.record_assets(run_dir, 'video', [video], created_at=mtime(video))
+            for preview in files(run_dir, ('.mp4',), 'preview_'):
+                self.record_assets(run_dir, 'preview', [preview], created_at=mtime(preview))
+
+            publish_path = os.path.join(run_dir, "publish.json")
+            if os.path.exists(publish_path):
+                with open(publish_path, 'r') as f:
+                    for platform, record in json.load(f).items():
+                        self.record_uploads(run_dir, os.path.join(run_dir, record['video_file']),
+                                            {platform: record})
+
+            # Best guess at how far the run got
+            if videos:
+                self.set_status(run_dir, 'done', 'render')
+            elif images:
+                self.set_status(run_dir, 'running', 'images')
+            else:
+                self.set_status(run_dir, 'running', 'script')
+            count += 1
+        return count
+
+_shared_catalog = None
+
+def shared_catalog():
+    """Catalog at CATALOG_PATH, opened once per process"""
+    global _shared_catalog
+    if _shared_catalog is None:
+        _shared_catalog = Catalog()
+    return _shared_catalog
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Query the catalog of runs and uploads')
+    parser.add_argument('command', choices=['runs', 'unpublished', 'failed', 'import'],
+                        help='runs: latest runs, unpublished: rendered videos missing from a platform, '
+                             'failed: runs that failed, import: index existing output folders')
+    parser.add_argument('--platform', choices=['youtube', 'instagram', 'all'], default='all',
+                        help='Platforms checked by unpublished')
+    parser.add_argument('--stage', help='Only runs that failed in this stage (script, images, render, upload)')
+    args = parser.parse_args()
+
+    catalog = Catalog()
+    if args.command == 'import':
+        print(f"Imported {catalog.import_runs()} runs into {catalog.path}")
+    elif args.command == 'runs':
+        for run in catalog.runs():
+            print(f"{run['run_dir']}  {run['status']:8} {run['last_stage'] or '-':8} {run['title']}")
+    elif args.command == 'unpublished':
+        platforms = ['youtube', 'instagram'] if args.platform == 'all' else [args.platform]
+        for row in catalog.unpublished(platforms):
+            print(f"{row['video_path']}  (published on: {row['published_on'] or 'nothing'})")
+    elif args.command == 'failed':
+        for run in catalog.failed(args.stage):
+            print(f"{run['run_dir']}  {run['failed_stage']}: {run['error']}")
@@ -0,0 +1,190 @@
+"""
+In-place fixed-point compositing for TimelineCompositor.
+
+moviepy blends every layer in float64 over a full-frame copy of the picture.
+The layers here draw straight into the uint8 frame instead, in integer math
+on 16-bit scratch buffers:
+
+- a layer only touches its own bounding box, and text layers only the bands
+  of rows that actually have ink
+- static RGBA layers keep their colour premultiplied by alpha, so a blend is
+  one multiply-add per channel
+- fully transparent moments are skipped and fully opaque ones are a copy
+
+Results are within a few levels of moviepy's float blend during fades
+(moviepy truncates where these round, and fade weights step in 1/256).
+"""
+import threading
+import numpy as np
+
+_scratch = threading.local()
+
+def scratch(shape, slot=0):
+    """Per-thread uint16 work buffer of at least `shape`, reused across frames"""
+    buffers = getattr(_scratch, 'buffers', None)
+    if buffers is None:
+        buffers = _scratch.buffers = {}
+    size = int(np.prod(shape))
+    buffer = buffers.get(slot)
+    if buffer is None or buffer.size < size:
+        buffer = buffers[slot] = np.empty(size, dtype=np.uint16)
+    return buffer[:size].reshape(shape)
+
+def div255(values, tmp):
+    """values = round(values / 255) in place, for values up to 255 * 255"""
+    values += 128
+    np.right_shift(values, 8, out=tmp)
+    values += tmp
+    values >>= 8
+    return values
+
+def blend_uniform(dst, src, weight):
+    """dst = (src * weight + dst * (256 - weight)) / 256 in place, weight 0..256"""
+    if weight >= 256:
+        np.copyto(dst, src)
+        return
+    if weight <= 0:
+        return
+    acc = scratch(dst.shape, 0)
+    tmp = scratch(dst.shape, 1)
+    np.multiply(src, np.uint16(weight), out=acc)
+    np.multiply(dst, np.uint16(256 - weight), out=tmp)
+    acc += tmp
+    acc += 128
+    acc >>= 8
+    np.copyto(dst, acc, casting='unsafe')
+
+def fade_factor(ct, duration, fade_in, fade_out):
+    """moviepy fadein/fadeout factor at clip time ct"""
+    factor = 1.0
+    if fade_in and ct < fade_in:
+        factor *= ct / fade_in
+    if fade_out and duration - ct < fade_out:
+        factor *= (duration - ct) / fade_out
+    return max(0.0, min(1.0, factor))
+
+def clip_box(x, y, w, h, frame_w, frame_h):
+    """Visible part of a w x h box at (x, y): (fx0, fy0, fx1, fy1, sx0, sy0), or None"""
+    fx0, fy0 = max(0, x), max(0, y)
+    fx1, fy1 = min(frame_w, x + w), min(frame_h, y + h)
+    if fx0 >= fx1 or fy0 >= fy1:
+        return None
+    return fx0, fy0, fx1, fy1, fx0 - x, fy0 - y
+
+class Layer:
+    """Timing shared by all layers; `end` is start + duration like a moviepy clip"""
+
+    def __init__(self, start, duration):
+        self.start = start
+        self.duration = duration
+        self.end = start + duration
+
+    def is_playing(self, t):
+        return self.start <= t < self.end
+
+    def draw_into(self, frame, t):
+        raise NotImplementedError
+
+class ImageLayer(Layer):
+    """
+    Full-frame opaque picture from `make_frame(ct)` that crossfades in and
+    out over whatever is below, like moviepy's crossfadein/crossfadeout.
+    """
+
+    def __init__(self, make_frame, start, duration, crossfade=0.0):
+        super().__init__(start, duration)
+        self.make_frame = make_frame
+        self.crossfade = crossfade
+
+    def release(self):
+        release = getattr(self.make_frame, 'release', None)
+        if release:
+            release()
+
+    def draw_into(self, frame, t):
+        ct = t - self.start
+        opacity = fade_factor(ct, self.duration, self.crossfade, self.crossfade)
+        weight = int(round(opacity * 256))
+        if weight <= 0:
+            return
+        picture = self.make_frame(ct)
+        h, w = frame.shape[:2]
+        blend_uniform(frame, picture[:h, :w], weight)
+
+class ColorLayer(Layer):
+    """Solid rectangle at `pos` with a fixed opacity, e.g. a shade behind the title"""
+
+    def __init__(self, color, size, pos, start, duration, opacity=1.0, fade_in=0.0, fade_out=0.0):
+        super().__init__(start, duration)
+        self.color = np.array(color, dtype=np.uint8)
+        self.size = size
+        self.pos = pos
+        self.opacity = opacity
+        self.fade_in = fade_in
+        self.fade_out = fade_out
+
+    def draw_into(self, frame, t):
+        box = clip_box(*self.pos, *self.size, frame.shape[1], frame.shape[0])
+        weight = int(round(self.opacity * 256))
+        if box is None or weight <= 0:
+            return
+        fx0, fy0, fx1, fy1, _, _ = box
+        # Like moviepy's fadein/fadeout on a colour clip: the colour fades to black
+        factor = fade_factor(t - self.start, self.duration, self.fade_in, self.fade_out)
+        color = np.round(self.color * factor).astype(np.uint8)
+        region = frame[fy0:fy1, fx0:fx1]
+        blend_uniform(region, np.broadcast_to(color, region.shape), weight)
+
+class RGBALayer(Layer):
+    """
+    Static RGBA picture (a caption or title) at `pos`.
+
+    Colour is stored premultiplied by alpha, and only bands of rows that
+    contain any ink are blended. fade_in/fade_out fade the colour from and
+    to black, as moviepy's fadein/fadeout do on an image clip.
+    """
+
+    def __init__(self, rgba, pos, start, duration, fade_in=0.0, fade_out=0.0):
+        super().__init__(start, duration)
+        self.pos = pos
+        self.fade_in = fade_in
+        self.fade_out = fade_out
+        self.size = (rgba.shape[1], rgba.shape[0])
+
+        alpha = rgba[:, :, 3]
+        self.bands = []  # (y0, y1, x0, x1, premultiplied rgb, 255 - alpha)
+        rows = np.flatnonzero(alpha.any(axis=1))
+        if len(rows):
+            # Runs of consecutive inked rows, e.g. one per line of text
+            breaks = np.flatnonzero(np.diff(rows) > 1)
+            for first, last in zip(np.r_[rows[0], rows[breaks + 1]], np.r_[rows[breaks], rows[-1]]):
+                y0, y1 = int(first), int(last) + 1
+                cols = np.flatnonzero(alpha[y0:y1].any(axis=0))
+                x0, x1 = int(cols[0]), int(cols[-1]) + 1
+                band_alpha = alpha[y0:y1, x0:x1, None].astype(np.uint16)
+                premultiplied = rgba[y0:y1, x0:x1, :3] * band_alpha
+                self.bands.append((y0, y1, x0, x1, premultiplied, 255 - band_alpha))
+
+    def draw_into(self, frame, t):
+        factor = fade_factor(t - self.start, self.duration, self.fade_in, self.fade_out)
+        frame_h, frame_w = frame.shape[:2]
+        for y0, y1, x0, x1, premultiplied, inverse_alpha in self.bands:
+            box = clip_box(self.pos[0] + x0, self.pos[1] + y0, x1 - x0, y1 - y0, frame_w, frame_h)
+            if box is None:
+                continue
+            fx0, fy0, fx1, fy1, sx0, sy0 = box
+            region = frame[fy0:fy1, fx0:fx1]
+            src = premultiplied[sy0:sy0 + fy1 - fy0, sx0:sx0 + fx1 - fx0]
+            inverse = inverse_alpha[sy0:sy0 + fy1 - fy0, sx0:sx0 + fx1 - fx0]
+
+            acc = scratch(region.shape, 0)
+            tmp = scratch(region.shape, 1)
+            np.multiply(region, inverse, out=acc)
+            if factor >= 1.0:
+                acc += src
+            else:
+                # Dim the colour, not the alpha: the text fades to black
+                np.multiply(src, factor, out=tmp, casting='unsafe')
+                acc += tmp
+            div255(acc, tmp)
+            np.copyto(region, acc, casting='unsafe')
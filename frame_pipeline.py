@@ -0,0 +1,148 @@
+import time
+import queue
+import threading
+import subprocess
+import numpy as np
+from moviepy.config import get_setting
+from instrumentation import METRICS
+
+# Defaults match write_videofile; crf replaces bitrate when both are given
+ENCODER_DEFAULTS = dict(codec='libx264', preset='medium', bitrate=None, crf=None, threads=None)
+
+def frame_count(duration, fps):
+    """Number of frames write_videofile produces for a clip"""
+    return len(np.arange(0, duration, 1.0 / fps))
+
+def encoder_command(output_path, size, fps, audio_path=None, codec='libx264', preset='medium',
+                    bitrate=None, crf=None, threads=None):
+    """ffmpeg command reading raw RGB frames from stdin, as moviepy's FFMPEG_VideoWriter builds it"""
+    width, height = size
+    cmd = [get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+           "-f", "rawvideo", "-vcodec", "rawvideo", "-s", f"{width}x{height}",
+           "-pix_fmt", "rgb24", "-r", "%.02f" % fps, "-an", "-i", "-"]
+    if audio_path is not None:
+        cmd += ["-i", audio_path, "-acodec", "copy"]
+    cmd += ["-vcodec", codec, "-preset", preset]
+    if crf is not None:
+        cmd += ["-crf", str(crf)]
+    elif bitrate is not None:
+        cmd += ["-b", bitrate]
+    if threads is not None:
+        cmd += ["-threads", str(threads)]
+    if codec == 'libx264' and width % 2 == 0 and height % 2 == 0:
+        cmd += ["-pix_fmt", "yuv420p"]
+    cmd.append(output_path)
+    return cmd
+
+class FramePipeline:
+    """
+    Render frames on producer threads while ffmpeg encodes the previous ones.
+
+    A fixed set of frame buffers is allocated up front. Producers take a free
+    buffer, claim the next frame number and draw into it (clips with a
+    frame_into(t, out) method draw in place), then hand it to the writer,
+    which streams buffers into ffmpeg's stdin in frame order and returns
+    them to the free list. The number of buffers bounds memory and how far
+    producers can run ahead of the encoder.
+    """
+
+    def __init__(self, clip, fps, producers=2, buffers=8):
+        self.clip = clip
+        self.fps = fps
+        self.producers = max(1, producers)
+        width, height = clip.size
+        self.buffers = [np.empty((height, width, 3), dtype=np.uint8)
+                        for _ in range(max(buffers, self.producers + 1))]
+
+    def _fill(self, t, out):
+        if hasattr(self.clip, 'frame_into'):
+            self.clip.frame_into(t, out)
+        else:
+            np.copyto(out, self.clip.get_frame(t), casting='unsafe')
+
+    def write(self, output_path, first_frame, end_frame, audio_path=None, **encoder):
+        """Encode frames [first_frame, end_frame) to output_path"""
+        settings = dict(ENCODER_DEFAULTS, **encoder)
+        free = queue.Queue()
+        for buffer in self.buffers:
+            free.put(buffer)
+        ready = {}
+        ready_changed = threading.Condition()
+        claim_lock = threading.Lock()
+        state = {'next': first_frame, 'error': None, 'stop': False}
+
+        def produce():
+            while True:
+                # Take a buffer before claiming a frame, so the oldest
+                # unwritten frame always has somewhere to go
+                buffer = free.get()
+                with claim_lock:
+                    frame_index = state['next']
+                    if state['stop'] or frame_index >= end_frame:
+                        return
+                    state['next'] += 1
+                try:
+                    # Same frame times as write_videofile's np.arange
+                    self._fill(frame_index * (1.0 / self.fps), buffer)
+                except Exception as e:
+                    with ready_changed:
+                        state['error'] = e
+                        ready_changed.notify_all()
+                    return
+                with ready_changed:
+                    ready[frame_index] = buffer
+                    ready_changed.notify_all()
+
+        started = time.perf_counter()
+        encoding = 0.0  # time spent blocked on the pipe while ffmpeg catches up
+        cmd = encoder_command(output_path, self.clip.size, self.fps, audio_path, **settings)
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE)
+        threads = [threading.Thread(target=produce, daemon=True) for _ in range(self.producers)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for frame_index in range(first_frame, end_frame):
+                with ready_changed:
+                    ready_changed.wait_for(lambda: frame_index in ready or state['error'])
+                    if state['error'] is not None:
+                        raise state['error']
+                    buffer = ready.pop(frame_index)
+                try:
+                    # The buffer itself goes to the pipe, no tobytes() copy
+                    write_started = time.perf_counter()
+                    proc.stdin.write(memoryview(buffer))
+                    encoding += time.perf_counter() - write_started
+                except BrokenPipeError:
+                    raise IOError(f"ffmpeg failed writing {output_path}:\n"
+                                  f"{proc.stderr.read().decode(errors='replace')}")
+                free.put(buffer)
+        finally:
+            with claim_lock:
+                state['stop'] = True
+            # Wake producers waiting for a buffer so they can see the stop flag
+            for _ in threads:
+                free.put(self.buffers[0])
+            for thread in threads:
+                thread.join()
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            errors = proc.stderr.read()
+            proc.stderr.close()
+            if proc.wait() != 0 and state['error'] is None:
+                raise IOError(f"ffmpeg failed writing {output_path}:\n{errors.decode(errors='replace')}")
+        # Drawing and encoding overlap, so this is the combined rate
+        METRICS.observe('render.frames', time.perf_counter() - started)
+        METRICS.observe('render.encode', encoding)
+        METRICS.add('render.frames', end_frame - first_frame)
+        return output_path
+
+def write_video(clip, output_path, fps, audio_path=None, producers=2, buffers=8, **encoder):
+    """Pipelined replacement for clip.write_videofile(output_path, fps, audio=audio_path)"""
+    total_frames = frame_count(clip.duration, fps)
+    print(f"Rendering {total_frames} frames with {producers} producer threads...")
+    pipeline = FramePipeline(clip, fps, producers=producers, buffers=buffers)
+    return pipeline.write(output_path, 0, total_frames, audio_path=audio_path, **encoder)
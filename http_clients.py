@@ -0,0 +1,66 @@
+import os
+import atexit
+import threading
+import httpx
+from openai import OpenAI, DefaultHttpxClient
+from dotenv import load_dotenv
+
+# Connections are kept open between requests, so only the first request to a
+# host pays for the TCP and TLS handshakes. Limits apply per host: the OpenAI
+# API and every download host get their own pool.
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', 16))
+HTTP_MAX_KEEPALIVE = int(os.getenv('HTTP_MAX_KEEPALIVE', 16))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', 60))  # seconds an idle connection is kept
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 10))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 60))
+# Image generation and speech synthesis can take well over a minute to answer
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', 180))
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', 2))
+
+_lock = threading.Lock()
+_clients = {}
+_pid = None
+
+def http_limits():
+    return httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY)
+
+def http_timeout(timeout=HTTP_TIMEOUT):
+    return httpx.Timeout(timeout, connect=HTTP_CONNECT_TIMEOUT)
+
+def _shared(key, factory):
+    """One client per key and process, created on first use"""
+    global _pid
+    with _lock:
+        if _pid != os.getpid():
+            # A forked worker must open its own connections, not share the parent's sockets
+            _clients.clear()
+            _pid = os.getpid()
+        if key not in _clients:
+            _clients[key] = factory()
+        return _clients[key]
+
+def shared_http_client(url):
+    """Pooled, keep-alive httpx client for the host of `url` (thread-safe)"""
+    host = httpx.URL(url).host
+    return _shared(('http', host), lambda: httpx.Client(
+        limits=http_limits(), timeout=http_timeout(), follow_redirects=True))
+
+def shared_openai_client():
+    """OpenAI client shared by every stage and idea in this process"""
+    def create():
+        load_dotenv()
+        return OpenAI(http_client=DefaultHttpxClient(limits=http_limits(),
+                                                     timeout=http_timeout(OPENAI_TIMEOUT)),
+                      max_retries=OPENAI_MAX_RETRIES)
+    return _shared('openai', create)
+
+@atexit.register
+def close_clients():
+    with _lock:
+        if _pid == os.getpid():
+            for client in _clients.values():
+                client.close()
+        _clients.clear()
@@ -0,0 +1,150 @@
+import os
+import weakref
+import threading
+import numpy as np
+from PIL import Image
+from run_manifest import file_hash
+from ken_burns import load_image_array, cover_size
+
+# Render-ready copies of a run's images live in prepared/ next to images/
+PREPARED_DIR = "prepared"
+
+# Full-resolution frame the images are prepared for ahead of the render
+FRAME_SIZE = (1080, 1920)
+
+# Arrays handed out by source_pixels/cover_pixels, so every clip of the same
+# image shares one mapping; an entry goes away with the last clip using it
+_pixel_pool = weakref.WeakValueDictionary()
+_pixel_pool_lock = threading.Lock()
+
+# Content hash per (path, size, mtime, inode), so a file is read once per process
+_content_versions = {}
+_content_versions_lock = threading.Lock()
+
+def image_size(path):
+    """(width, height) read from the file header, without decoding the pixels"""
+    with Image.open(path) as img:
+        return img.size
+
+def prepared_dir(image_path):
+    """prepared/ next to a run's images/ folder, or inside any other image folder"""
+    image_dir = os.path.dirname(os.path.abspath(image_path))
+    if os.path.basename(image_dir) == "images":
+        return os.path.join(os.path.dirname(image_dir), PREPARED_DIR)
+    return os.path.join(image_dir, PREPARED_DIR)
+
+def content_version(image_path):
+    """Short content hash of an image file"""
+    stat = os.stat(image_path)
+    key = (image_path, stat.st_size, stat.st_mtime_ns, stat.st_ino)
+    with _content_versions_lock:
+        version = _content_versions.get(key)
+    if version is None:
+        version = file_hash(image_path)[:16]
+        with _content_versions_lock:
+            _content_versions[key] = version
+    return version
+
+def _prepared_path(image_path, variant):
+    image_path = os.path.abspath(image_path)
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    # Tied to the image's content rather than the file: a replaced image never
+    # gets stale pixels, and the same image linked in again (a cache hit from
+    # another run, a copy) keeps its prepared copies
+    version = content_version(image_path)
+    return os.path.join(prepared_dir(image_path), f"{stem}.{variant}.{version}.npy")
+
+def _load_or_create(path, create):
+    """Memory-map a prepared array, building and saving it on first use"""
+    with _pixel_pool_lock:
+        pixels = _pixel_pool.get(path)
+    if pixels is not None:
+        return pixels
+    pixels = _load_or_create_file(path, create)
+    with _pixel_pool_lock:
+        return _pixel_pool.setdefault(path, pixels)
+
+def _load_or_create_file(path, create):
+    if os.path.exists(path):
+        return np.load(path, mmap_mode='r')
+
+    pixels = create()
+    directory, name = os.path.split(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # Drop copies made from an earlier version of this image
+        prefix = name.rsplit('.', 2)[0] + '.'
+        for old in os.listdir(directory):
+            if old.startswith(prefix) and old.endswith('.npy') and old != name:
+                os.remove(os.path.join(directory, old))
+
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(pixels))
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Could not save prepared image {path}: {e}")
+        return pixels
+    return np.load(path, mmap_mode='r')
+
+def source_pixels(image_path):
+    """Decoded RGB pixels of an image, mapped from its prepared copy"""
+    return _load_or_create(_prepared_path(image_path, 'source'),
+                           lambda: load_image_array(image_path))
+
+def cover_pixels(image_path, width, height):
+    """The image already scaled to cover a width x height frame (see cover_size)"""
+    src_w, src_h = image_size(image_path)
+    cover = cover_size(src_w, src_h, width, height)
+
+    def create():
+        pixels = np.asarray(source_pixels(image_path))
+        if (src_w, src_h) == cover:
+            return pixels
+        return np.asarray(Image.fromarray(pixels).resize(cover, Image.BILINEAR))
+
+    return _load_or_create(_prepared_path(image_path, f"{cover[0]}x{cover[1]}"), create)
+
+def prepare_image(image_path, width=FRAME_SIZE[0], height=FRAME_SIZE[1]):
+    """Build an image's prepared copies now, so renders only map them from disk"""
+    source_pixels(image_path)
+    cover_pixels(image_path, width, height)
+
+def check_prepared_reuse():
+    """
+    Prepare an image, put the same bytes back as a new file the way a cache
+    hit does, and check prepared/ is reused as is; then change the image and
+    check its copies are rebuilt
+    """
+    import shutil
+    import tempfile
+    run_dir = tempfile.mkdtemp(prefix="prepared_check_")
+    try:
+        images_dir = os.path.join(run_dir, "images")
+        os.makedirs(images_dir)
+        image_path = os.path.join(images_dir, "image_1.png")
+        rng = np.random.default_rng(0)
+        Image.fromarray(rng.integers(0, 256, (1792, 1024, 3), dtype=np.uint8)).save(image_path)
+        prepare_image(image_path)
+
+        directory = prepared_dir(image_path)
+        before = {name: os.stat(os.path.join(directory, name)).st_mtime_ns for name in os.listdir(directory)}
+
+        # A new inode and mtime with the same content
+        shutil.copyfile(image_path, image_path + ".cached")
+        os.replace(image_path + ".cached", image_path)
+        prepare_image(image_path)
+        after = {name: os.stat(os.path.join(directory, name)).st_mtime_ns for name in os.listdir(directory)}
+        assert after == before, f"prepared copies were rebuilt for the same image: {before} -> {after}"
+
+        Image.fromarray(rng.integers(0, 256, (1792, 1024, 3), dtype=np.uint8)).save(image_path)
+        prepare_image(image_path)
+        changed = set(os.listdir(directory))
+        assert len(changed) == len(before) and not changed & set(before), \
+            f"a changed image kept its old prepared copies: {sorted(changed)}"
+        print(f"✓ prepared copies reused for an identical image and rebuilt for a changed one ({len(before)} files)")
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    check_prepared_reuse()
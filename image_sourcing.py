@@ -1,101 +1,198 @@
-from openai import OpenAI
+from openai import RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
 import os
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import requests
-from moviepy.editor import ImageClip
+import httpx
 from datetime import datetime
+from asset_cache import AssetCache, cache_key
+from instrumentation import METRICS
+from http_clients import shared_openai_client, shared_http_client
+from image_prep import image_size, prepare_image
 
 # Load environment variables from the .env file
 load_dotenv()
 
-def get_images(prompts, output_dir):
-    # Load environment variables
-    load_dotenv()
-    client = OpenAI()
-    
-    image_paths = []
-    
+IMAGE_MODEL = "dall-e-3"
+IMAGE_SIZE = "1024x1792"  # Portrait mode ratio
+IMAGE_QUALITY = "standard"
+
+# Generated images are kept across runs, keyed by everything that affects the
+# result, so a repeated prompt costs nothing. Oldest-used images go first.
+IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', 2 * 1024**3))
+
+# Attempts of generate_image's own retry loop. The OpenAI client's built-in
+# retries are turned off for the image call, so the two don't multiply
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 2  # seconds, doubled after every failed attempt
+
+# Errors worth retrying: rate limits, timeouts, dropped connections and 5xx
+TRANSIENT_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError,
+                    httpx.NetworkError, httpx.TimeoutException, httpx.RemoteProtocolError)
+TRANSIENT_STATUS_CODES = (429, 500, 502, 503, 504)
+
+def is_transient(error):
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    response = getattr(error, 'response', None)
+    return isinstance(error, httpx.HTTPStatusError) and response is not None \
+        and response.status_code in TRANSIENT_STATUS_CODES
+
+def enhance_prompt(prompt):
+    """Enhance prompt to specify vertical orientation"""
+    return f"""Create a vertical portrait image in 9:16 aspect ratio. 
+                The image should be optimized for vertical phone screens, with the main subject centered vertically. 
+                Important: Must be in portrait orientation (taller than wide). {prompt}"""
+
+def retry_delay(error, attempt):
+    """Seconds to wait before the next attempt, honouring Retry-After when given"""
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return RETRY_BASE_DELAY * 2 ** attempt + random.uniform(0, 1)
+
+def download_image(image_url, path):
+    """Stream an image straight to disk over a kept-alive connection; returns the number of bytes"""
+    size = 0
+    client = shared_http_client(image_url)
+    with METRICS.timer('api.image_download'), client.stream("GET", image_url) as img_response:
+        img_response.raise_for_status()
+        with open(path, "wb") as img_file:
+            for chunk in img_response.iter_bytes(chunk_size=64 * 1024):
+                img_file.write(chunk)
+                size += len(chunk)
+    METRICS.add('api.image_download.bytes', size)
+    return size
+
+def generate_image(client, i, prompt, images_dir, cache=None):
+    """Generate and download one image, retrying transient failures"""
+    enhanced_prompt = enhance_prompt(prompt)
+    temp_image_path = os.path.join(images_dir, f"temp_{i}.png")
+    key = cache_key(enhanced_prompt, IMAGE_MODEL, IMAGE_SIZE, IMAGE_QUALITY)
+
+    if cache is not None and cache.get(key):
+        print(f"[image {i}] Found in image cache")
+        METRICS.add('images.cache_hits')
+        cache.link_to(key, temp_image_path)
+        return finish_image(i, prompt, enhanced_prompt, temp_image_path, images_dir)
+
+    # Kept across attempts: a failed download retries the download only,
+    # without paying for (and waiting on) another generation
+    image_url = None
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            if image_url is None:
+                # Generate image using DALL-E
+                print(f"[image {i}] Calling DALL-E API...")
+                start_time = datetime.now()
+                with METRICS.timer('api.image_generate'):
+                    response = client.with_options(max_retries=0).images.generate(
+                        model=IMAGE_MODEL,
+                        prompt=enhanced_prompt,
+                        size=IMAGE_SIZE,
+                        quality=IMAGE_QUALITY,
+                        n=1,
+                    )
+                image_url = response.data[0].url
+                print(f"[image {i}] Generated in {(datetime.now() - start_time).total_seconds():.1f} seconds")
+
+            print(f"[image {i}] Downloading image...")
+            download_image(image_url, temp_image_path)
+            break
+        except Exception as e:
+            if attempt == MAX_ATTEMPTS - 1 or not is_transient(e):
+                raise
+            delay = retry_delay(e, attempt)
+            print(f"[image {i}] {type(e).__name__}, retrying in {delay:.1f} seconds...")
+            METRICS.add('images.retries')
+            time.sleep(delay)
+
+    if cache is not None:
+        cache.put(key, temp_image_path)
+    return finish_image(i, prompt, enhanced_prompt, temp_image_path, images_dir)
+
+def finish_image(i, prompt, enhanced_prompt, temp_image_path, images_dir):
+    """Measure a downloaded image, move it to its final name and prepare it for rendering"""
+    # Check orientation from the file header; no need to decode the pixels
+    width, height = image_size(temp_image_path)
+
+    # Move temp file to final location
+    image_filename = f"image_{i}.png"
+    image_path = os.path.join(images_dir, image_filename)
+    if os.path.exists(image_path):
+        # Renaming onto another hard link of the same cached file is a no-op
+        os.remove(image_path)
+    os.replace(temp_image_path, image_path)
+    prepare_image(image_path)
+
+    print(f"✓ Image {i} saved to: {image_path} ({width}x{height})")
+
+    # Log warning if image isn't in portrait mode
+    if width > height:
+        print(f"⚠ Warning: Image {i} was generated in landscape orientation ({width}x{height})")
+
+    return {
+        'prompt': prompt,
+        'enhanced_prompt': enhanced_prompt,
+        'filename': image_filename,
+        'path': image_path,
+        'width': width,
+        'height': height,
+    }
+
+@METRICS.timed('stage.images')
+def get_images(prompts, output_dir, max_workers=4, use_cache=True):
+    client = shared_openai_client()
+    cache = AssetCache("images", IMAGE_CACHE_MAX_BYTES, suffix=".png") if use_cache else None
+
     # Create output directory for sources and images
     os.makedirs(output_dir, exist_ok=True)
     sources_path = os.path.join(output_dir, "image_sources.txt")
     images_dir = os.path.join(output_dir, "images")
     os.makedirs(images_dir, exist_ok=True)
-    
-    print("\nStarting image generation process...")
-    
-    with open(sources_path, "w") as f:
-        f.write("Image Prompts and Sources:\n")
-        f.write("=" * 50 + "\n\n")
-        
-        # Process each prompt
-        for i, prompt in enumerate(prompts, 1):
+
+    print(f"\nStarting image generation process ({len(prompts)} prompts, {max_workers} at a time)...")
+
+    # Run prompts concurrently; results are collected by prompt number so the
+    # output below stays in prompt order regardless of completion order
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(generate_image, client, i, prompt, images_dir, cache): i
+            for i, prompt in enumerate(prompts, 1)
+        }
+        for future, i in futures.items():
             try:
-                print(f"\nGenerating image {i} of {len(prompts)}...")
-                print(f"Prompt: {prompt}")
-                
-                # Enhance prompt to specify vertical orientation
-                enhanced_prompt = f"""Create a vertical portrait image in 9:16 aspect ratio. 
-                The image should be optimized for vertical phone screens, with the main subject centered vertically. 
-                Important: Must be in portrait orientation (taller than wide). {prompt}"""
-                
-                # Generate image using DALL-E
-                print("Calling DALL-E API...")
-                start_time = datetime.now()
-                response = client.images.generate(
-                    model="dall-e-3",
-                    prompt=enhanced_prompt,
-                    size="1024x1792",  # Portrait mode ratio
-                    quality="standard",
-                    n=1,
-                )
-                
-                # Get the image URL
-                image_url = response.data[0].url
-                print(f"Image generated in {(datetime.now() - start_time).total_seconds():.1f} seconds")
-                
-                # Download the image
-                print("Downloading image...")
-                img_response = requests.get(image_url)
-                img_response.raise_for_status()
-                
-                # Save the image temporarily
-                temp_image_path = os.path.join(images_dir, f"temp_{i}.png")
-                with open(temp_image_path, "wb") as img_file:
-                    img_file.write(img_response.content)
-                
-                # Check orientation using moviepy
-                clip = ImageClip(temp_image_path)
-                width, height = clip.size
-                
-                # Final image path
-                image_filename = f"image_{i}.png"
-                image_path = os.path.join(images_dir, image_filename)
-                
-                # Write prompt and source to file
-                f.write(f"Image {i}:\n")
-                f.write(f"Original Prompt: {prompt}\n")
-                f.write(f"Enhanced Prompt: {enhanced_prompt}\n")
-                f.write(f"Saved as: {image_filename}\n")
-                f.write(f"Dimensions: {width}x{height}\n\n")
-                
-                # Move temp file to final location
-                os.rename(temp_image_path, image_path)
-                image_paths.append(image_path)
-                
-                print(f"✓ Image saved to: {image_path}")
-                print(f"Dimensions: {width}x{height}")
-                
-                # Log warning if image isn't in portrait mode
-                if width > height:
-                    print(f"⚠ Warning: Image {i} was generated in landscape orientation ({width}x{height})")
-            
+                results[i] = future.result()
             except Exception as e:
                 print(f"❌ Error generating image for prompt {i}: {e}")
+                temp_image_path = os.path.join(images_dir, f"temp_{i}.png")
                 if os.path.exists(temp_image_path):
                     os.remove(temp_image_path)
-    
+
+    image_paths = []
+    with open(sources_path, "w") as f:
+        f.write("Image Prompts and Sources:\n")
+        f.write("=" * 50 + "\n\n")
+
+        for i in sorted(results):
+            image = results[i]
+            f.write(f"Image {i}:\n")
+            f.write(f"Original Prompt: {image['prompt']}\n")
+            f.write(f"Enhanced Prompt: {image['enhanced_prompt']}\n")
+            f.write(f"Saved as: {image['filename']}\n")
+            f.write(f"Dimensions: {image['width']}x{image['height']}\n\n")
+            image_paths.append(image['path'])
+
     print(f"\nImage generation complete! Generated {len(image_paths)} images")
     print(f"Image sources saved to: {sources_path}")
+    if cache is not None:
+        print(cache.report())
     return image_paths, sources_path
 
 # Example usage
@@ -1,15 +1,32 @@
 import os
 import json
+import threading
 from instagrapi import Client
+from instagrapi.exceptions import LoginRequired
 from time import sleep
 
+# Saved login session (cookies, device ids), reused instead of a fresh
+# username/password login on every upload
+SESSION_FILE = os.getenv('INSTAGRAM_SESSION_FILE', 'instagram_session.json')
+
 class InstagramUploader:
-    def __init__(self):
+    """
+    Long-lived uploader that logs in once and keeps the session on disk.
+
+    The saved session is loaded on first use and only replaced by a full
+    login when Instagram rejects it. Uploads through one instance are
+    serialized, since the client isn't thread-safe. Use
+    shared_instagram_uploader() to share one across a batch.
+    """
+
+    def __init__(self, session_file=SESSION_FILE):
         self.client = Client()
+        self.session_file = session_file
         self._logged_in = False
+        self._lock = threading.Lock()
         
-    def login(self, username=None, password=None):
-        """Login to Instagram"""
+    def login(self, username=None, password=None, relogin=False):
+        """Login to Instagram, reusing the saved session when it is still valid"""
         # Try to get credentials from environment variables if not provided
         if not username:
             username = os.getenv('INSTAGRAM_USERNAME')
@@ -19,48 +36,81 @@ class InstagramUploader:
         if not username or not password:
             raise ValueError("Instagram credentials not found. Set INSTAGRAM_USERNAME and INSTAGRAM_PASSWORD in .env file")
         
-        print("Logging into Instagram...")
         try:
-            self.client.login(username, password)
+            if not relogin and os.path.exists(self.session_file):
+                print("Restoring saved Instagram session...")
+                self.client.load_settings(self.session_file)
+                self.client.login(username, password)
+                try:
+                    # Cheap request to find out whether the session still works
+                    self.client.get_timeline_feed()
+                except LoginRequired:
+                    print("Saved Instagram session expired")
+                    relogin = True
+
+            if relogin or not os.path.exists(self.session_file):
+                print("Logging into Instagram...")
+                # Keep the device ids so Instagram sees the same device
+                old_settings = self.client.get_settings()
+                self.client.set_settings({})
+                if old_settings.get('uuids'):
+                    self.client.set_uuids(old_settings['uuids'])
+                self.client.login(username, password)
+
+            self.client.dump_settings(self.session_file)
             self._logged_in = True
             print("Successfully logged into Instagram")
         except Exception as e:
             print(f"Failed to login to Instagram: {str(e)}")
             self._logged_in = False
+
+    def _clip_upload(self, video_path, caption):
+        return self.client.clip_upload(
+            video_path,
+            caption=caption,
+            extra_data={
+                "custom_accessibility_caption": "",
+                "like_and_view_counts_disabled": False,
+                "disable_comments": False
+            }
+        )
         
     def upload_reel(self, video_path, caption):
-        """Upload a video as an Instagram Reel"""
-        try:
+        """Upload a video as an Instagram Reel; returns the post's short code"""
+        with self._lock:
             if not self._logged_in:
                 self.login()
+                if not self._logged_in:
+                    raise RuntimeError("Could not log into Instagram")
                 
             print(f"Uploading video to Instagram: {os.path.basename(video_path)}")
             
-            # Upload the video as a reel
-            media = self.client.clip_upload(
-                video_path,
-                caption=caption,
-                extra_data={
-                    "custom_accessibility_caption": "",
-                    "like_and_view_counts_disabled": False,
-                    "disable_comments": False
-                }
-            )
+            # Upload the video as a reel, logging in again once if the session expired
+            try:
+                media = self._clip_upload(video_path, caption)
+            except LoginRequired:
+                self.login(relogin=True)
+                media = self._clip_upload(video_path, caption)
             
-            if media:
-                print("Successfully uploaded to Instagram!")
-                print(f"Post URL: https://www.instagram.com/p/{media.code}/")
-                return True
-            else:
-                print("Failed to upload to Instagram")
-                return False
-                
-        except Exception as e:
-            print(f"Error uploading to Instagram: {str(e)}")
-            return False
+            if not media:
+                raise RuntimeError("Instagram did not return the uploaded media")
+            print("Successfully uploaded to Instagram!")
+            print(f"Post URL: https://www.instagram.com/p/{media.code}/")
+            return media.code
+
+_shared_uploader = None
+_shared_lock = threading.Lock()
+
+def shared_instagram_uploader():
+    """One InstagramUploader per process, shared by every upload"""
+    global _shared_uploader
+    with _shared_lock:
+        if _shared_uploader is None:
+            _shared_uploader = InstagramUploader()
+        return _shared_uploader
         
-def upload_to_instagram(video_path, content_dir):
-    """Helper function to upload a video using content from its directory"""
+def upload_to_instagram(video_path, content_dir, raise_errors=False):
+    """Helper function to upload a video using content from its directory; returns the post code"""
     
     # Load content.json for caption
     with open(os.path.join(content_dir, "content.json"), 'r') as f:
@@ -70,20 +120,22 @@ def upload_to_instagram(video_path, content_dir):
     with open(os.path.join(content_dir, "social_description.txt"), 'r') as f:
         description = f.read()
 
-    # Initialize uploader and upload video
-    uploader = InstagramUploader()
+    # Reuse the logged-in uploader across videos
+    uploader = shared_instagram_uploader()
     try:
-        success = uploader.upload_reel(
+        code = uploader.upload_reel(
             video_path=video_path,
             caption=description
         )
-        return success
+        return code
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Instagram upload failed: {str(e)}")
-        return False
+        return None
 
 if __name__ == "__main__":
     # Example usage
     video_dir = "output_videos/20240321_143022"
     video_path = os.path.join(video_dir, "video_20240321_143022.mp4")
-    upload_to_instagram(video_path, video_dir) 
\ No newline at end of file
+    upload_to_instagram(video_path, video_dir)
@@ -0,0 +1,176 @@
+import os
+import sys
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def peak_rss_bytes():
+    """Peak resident memory of this process, or None where it can't be read"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+class Metrics:
+    """
+    Process-wide, thread-safe collection of timings and counters.
+
+    - timings: named durations (stage wall time, API call latency), reported
+      with count, total and p50/p95/p99
+    - counters: named totals such as bytes transferred, frames rendered or
+      cache hits
+
+    Work done in other processes is brought back with snapshot() in the
+    worker and merge() in the parent (see collect()).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.timings = {}
+            self.counters = {}
+            self.worker_peak_rss = 0
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self.timings.setdefault(name, []).append(seconds)
+
+    def add(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def timer(self, name):
+        """Time the block as one observation of `name`, failed or not"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """Decorator: time every call of the function as `name`"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        with self._lock:
+            return {'timings': {k: list(v) for k, v in self.timings.items()},
+                    'counters': dict(self.counters),
+                    'peak_rss_bytes': max(peak_rss_bytes() or 0, self.worker_peak_rss)}
+
+    def merge(self, snapshot):
+        with self._lock:
+            for name, values in snapshot['timings'].items():
+                self.timings.setdefault(name, []).extend(values)
+            for name, amount in snapshot['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + amount
+            self.worker_peak_rss = max(self.worker_peak_rss, snapshot.get('peak_rss_bytes') or 0)
+
+    def report(self):
+        """Summary as a JSON-ready dict"""
+        with self._lock:
+            timings = {}
+            for name, values in sorted(self.timings.items()):
+                ordered = sorted(values)
+                timings[name] = {
+                    'count': len(ordered),
+                    'total_seconds': round(sum(ordered), 3),
+                    'p50': round(percentile(ordered, 0.50), 3),
+                    'p95': round(percentile(ordered, 0.95), 3),
+                    'p99': round(percentile(ordered, 0.99), 3),
+                    'max': round(ordered[-1], 3),
+                }
+            counters = dict(sorted(self.counters.items()))
+            worker_peak = self.worker_peak_rss
+
+        # Derived rates
+        rates = {}
+        frames = timings.get('render.frames')
+        if frames and counters.get('render.frames'):
+            rates['render.frames_per_second'] = round(counters['render.frames'] / frames['total_seconds'], 2)
+        for name in counters:
+            if name.endswith('.bytes'):
+                timing = timings.get(name[:-len('.bytes')])
+                if timing and timing['total_seconds'] > 0:
+                    rates[name[:-len('.bytes')] + '.bytes_per_second'] = round(
+                        counters[name] / timing['total_seconds'])
+
+        return {
+            'started_at': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+            'wall_seconds': round(time.time() - self.started, 3),
+            'peak_rss_bytes': peak_rss_bytes(),
+            'worker_peak_rss_bytes': worker_peak or None,
+            'timings': timings,
+            'counters': counters,
+            'rates': rates,
+        }
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=4)
+        return path
+
+    def write_prometheus(self, path, prefix='video_pipeline'):
+        """Write the report in the Prometheus textfile collector format"""
+        report = self.report()
+
+        def metric_name(name):
+            return prefix + '_' + ''.join(c if c.isalnum() else '_' for c in name)
+
+        lines = [f"# TYPE {prefix}_wall_seconds gauge", f"{prefix}_wall_seconds {report['wall_seconds']}"]
+        for key in ('peak_rss_bytes', 'worker_peak_rss_bytes'):
+            if report[key] is not None:
+                lines += [f"# TYPE {prefix}_{key} gauge", f"{prefix}_{key} {report[key]}"]
+        for name, timing in report['timings'].items():
+            base = metric_name(name) + '_seconds'
+            lines.append(f"# TYPE {base} summary")
+            for q in ('p50', 'p95', 'p99'):
+                lines.append(f'{base}{{quantile="0.{q[1:]}"}} {timing[q]}')
+            lines.append(f"{base}_sum {timing['total_seconds']}")
+            lines.append(f"{base}_count {timing['count']}")
+        for name, value in report['counters'].items():
+            base = metric_name(name) + '_total'
+            lines += [f"# TYPE {base} counter", f"{base} {value}"]
+        for name, value in report['rates'].items():
+            base = metric_name(name)
+            lines += [f"# TYPE {base} gauge", f"{base} {value}"]
+
+        # Write then rename, so the collector never reads a half-written file
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(temp_path, path)
+        return path
+
+METRICS = Metrics()
+
+def collect(fn, *args, **kwargs):
+    """Run fn in a worker process and return (result, metrics snapshot) for METRICS.merge"""
+    METRICS.reset()
+    result = fn(*args, **kwargs)
+    return result, METRICS.snapshot()
@@ -0,0 +1,209 @@
+import numpy as np
+from PIL import Image
+import time
+import threading
+
+EFFECT_TYPES = ['zoom_in', 'zoom_out', 'pan_left', 'pan_right', 'pan_up', 'pan_down']
+
+def load_image_array(img_path):
+    """Decode an image file once into an RGB uint8 array"""
+    with Image.open(img_path) as img:
+        return np.asarray(img.convert('RGB'))
+
+def cover_size(src_w, src_h, width, height, scale_factor=1.5):
+    """Size the image is scaled to so it covers the frame with room for movement"""
+    aspect_ratio = src_w / src_h
+    if aspect_ratio > width/height:  # too wide
+        new_h = height
+        new_w = int(height * aspect_ratio)
+    else:  # too tall
+        new_w = width
+        new_h = int(width / aspect_ratio)
+    return int(new_w * scale_factor), int(new_h * scale_factor)
+
+def compute_crop_boxes(effect_type, src_size, cover, width, height, duration, fps):
+    """
+    Precompute the visible rectangle of every frame for a pan/zoom effect.
+
+    Boxes are (x0, y0, x1, y1) in source image pixels, one row per frame.
+    The geometry matches the old resize-then-crop path: the image is scaled to
+    `cover` (see cover_size), zoomed, then a width x height window is cropped
+    out of it.
+    """
+    src_w, src_h = src_size
+    cover_w, cover_h = cover
+    n_frames = int(np.ceil(duration * fps)) + 1
+    progress = np.clip(np.arange(n_frames) / fps / duration, 0, 1)
+
+    center_x = (cover_w - width) // 2
+    center_y = (cover_h - height) // 2
+    zoom = np.ones(n_frames)
+    pos_x = np.full(n_frames, center_x, dtype=np.float64)
+    pos_y = np.full(n_frames, center_y, dtype=np.float64)
+
+    if effect_type == 'zoom_in':
+        zoom = 1 - (0.3 * progress)  # Start at 100%, end at 70%
+    elif effect_type == 'zoom_out':
+        zoom = 0.7 + (0.3 * progress)  # Start at 70%, end at 100%
+    elif effect_type == 'pan_left':
+        pos_x = np.floor((cover_w - width) * (1 - progress))
+    elif effect_type == 'pan_right':
+        pos_x = np.floor((cover_w - width) * progress)
+    elif effect_type == 'pan_up':
+        pos_y = np.floor((cover_h - height) * (1 - progress))
+    elif effect_type == 'pan_down':
+        pos_y = np.floor((cover_h - height) * progress)
+    else:
+        raise ValueError(f"Unknown effect type: {effect_type}")
+
+    # Never zoom out so far that the window falls off the image
+    zoom = np.maximum(zoom, max(width / cover_w, height / cover_h))
+
+    # Ensure we don't go out of bounds of the zoomed image
+    zoomed_w = np.floor(cover_w * zoom)
+    zoomed_h = np.floor(cover_h * zoom)
+    pos_x = np.clip(pos_x, 0, zoomed_w - width)
+    pos_y = np.clip(pos_y, 0, zoomed_h - height)
+
+    # Map the window from zoomed-cover coordinates back to source pixels
+    to_src_x = src_w / (cover_w * zoom)
+    to_src_y = src_h / (cover_h * zoom)
+    boxes = np.empty((n_frames, 4))
+    boxes[:, 0] = pos_x * to_src_x
+    boxes[:, 1] = pos_y * to_src_y
+    boxes[:, 2] = (pos_x + width) * to_src_x
+    boxes[:, 3] = (pos_y + height) * to_src_y
+    return boxes
+
+class KenBurnsEngine:
+    """Renders pan/zoom frames from a single decoded image"""
+
+    def __init__(self, pixels, width, height, duration, fps=30, effect_type='zoom_in', scale_factor=1.5,
+                 source_size=None):
+        self.pixels = pixels
+        self.width = width
+        self.height = height
+        self.duration = duration
+        self.fps = fps
+        self.effect_type = effect_type
+        src_h, src_w = pixels.shape[:2]
+        # source_size is the original (width, height) when pixels were already
+        # scaled to cover the frame (see image_prep.cover_pixels)
+        cover = cover_size(*(source_size or (src_w, src_h)), width, height, scale_factor)
+        self._image = None
+
+        # Pans never change scale, so resample once up front and every frame
+        # becomes a plain slice of the covering image
+        if effect_type not in ('zoom_in', 'zoom_out'):
+            if (src_w, src_h) != cover:
+                self.pixels = np.asarray(Image.fromarray(pixels).resize(cover, Image.BILINEAR))
+                src_w, src_h = cover
+        else:
+            self._image = Image.fromarray(pixels)
+        self.boxes = compute_crop_boxes(effect_type, (src_w, src_h), cover, width, height,
+                                        duration, fps)
+
+    def frame_index(self, t):
+        return min(max(int(round(t * self.fps)), 0), len(self.boxes) - 1)
+
+    def get_frame(self, t):
+        x0, y0, x1, y1 = self.boxes[self.frame_index(t)]
+
+        # Window already at output size on the pixel grid: plain slice, no resample
+        if (x1 - x0 == self.width and y1 - y0 == self.height
+                and x0.is_integer() and y0.is_integer()):
+            x0, y0 = int(x0), int(y0)
+            return self.pixels[y0:y0 + self.height, x0:x0 + self.width]
+
+        # Otherwise resample only the visible region straight to output size
+        if self._image is None:
+            self._image = Image.fromarray(np.asarray(self.pixels))
+        frame = self._image.resize((self.width, self.height), Image.BILINEAR,
+                                   box=(x0, y0, x1, y1))
+        return np.asarray(frame)
+
+class LazyKenBurns:
+    """
+    Frame function of one image clip that builds its KenBurnsEngine on the
+    first frame and drops it again on release().
+
+    Long timelines repeat the same images many times; this way only the
+    clips on screen hold any pixels or resampling state, and the pixels
+    themselves come from load_pixels (shared between clips of one image).
+    """
+
+    def __init__(self, load_pixels, width, height, duration, fps=30, effect_type='zoom_in',
+                 source_size=None):
+        self.load_pixels = load_pixels
+        self.width = width
+        self.height = height
+        self.duration = duration
+        self.fps = fps
+        self.effect_type = effect_type
+        self.source_size = source_size
+        self._engine = None
+        self._lock = threading.Lock()
+
+    def engine(self):
+        engine = self._engine
+        if engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._engine = KenBurnsEngine(self.load_pixels(), self.width, self.height,
+                                                  self.duration, self.fps, self.effect_type,
+                                                  source_size=self.source_size)
+                engine = self._engine
+        return engine
+
+    def __call__(self, t):
+        return self.engine().get_frame(t)
+
+    def release(self):
+        """Drop the engine; the next frame builds it again"""
+        self._engine = None
+
+def _legacy_frame(img_clip, effect_type, t, duration, width, height):
+    """The previous resize-then-crop implementation, kept for benchmarking"""
+    progress = t / duration
+    zoom = {'zoom_in': 1 - (0.3 * progress), 'zoom_out': 0.7 + (0.3 * progress)}.get(effect_type, 1)
+    pos_x = (img_clip.w - width) // 2
+    pos_y = (img_clip.h - height) // 2
+    if effect_type == 'pan_right':
+        pos_x = int((img_clip.w - width) * progress)
+    zoomed = img_clip.resize(zoom)
+    pos_x = max(0, min(pos_x, zoomed.w - width))
+    pos_y = max(0, min(pos_y, zoomed.h - height))
+    return zoomed.crop(x1=pos_x, y1=pos_y, width=width, height=height).get_frame(t)
+
+def benchmark(n_frames=60, width=1080, height=1920, fps=30):
+    """Compare frames per second of the engine against the old per-frame resize"""
+    from moviepy.editor import ImageClip
+
+    # DALL-E portrait output size, filled with noise so nothing compresses away
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, size=(1792, 1024, 3), dtype=np.uint8)
+    duration = n_frames / fps
+    times = np.arange(n_frames) / fps
+
+    cover_w, cover_h = cover_size(1024, 1792, width, height)
+    results = {}
+    for effect_type in ['zoom_in', 'pan_right']:
+        legacy_clip = ImageClip(pixels).resize((cover_w, cover_h))
+        start = time.perf_counter()
+        for t in times:
+            _legacy_frame(legacy_clip, effect_type, t, duration, width, height)
+        legacy_fps = n_frames / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        engine = KenBurnsEngine(pixels, width, height, duration, fps, effect_type)
+        for t in times:
+            engine.get_frame(t)
+        engine_fps = n_frames / (time.perf_counter() - start)
+
+        results[effect_type] = (legacy_fps, engine_fps)
+        print(f"{effect_type:>10}: legacy {legacy_fps:6.1f} fps | engine {engine_fps:6.1f} fps "
+              f"| {engine_fps / legacy_fps:.1f}x")
+    return results
+
+if __name__ == "__main__":
+    benchmark()
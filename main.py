@@ -1,13 +1,20 @@
-from script_generation import generate_script
-from image_sourcing import get_images
-from video_creation import create_video
-from text_to_speech import generate_audio
+from script_generation import generate_script, SCRIPT_CACHE_MAX_BYTES, SCRIPT_MODEL, PROMPT_TEMPLATE_HASH
+from image_sourcing import get_images, IMAGE_MODEL, IMAGE_SIZE, IMAGE_QUALITY
+from video_creation import create_video, RENDER_SETTINGS, PREVIEW_SETTINGS
+from text_to_speech import generate_audio, TTS_MODEL, TTS_VOICE
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from asset_cache import AssetCache, cache_key
+from run_manifest import RunManifest
+from catalog import shared_catalog
+from http_clients import shared_openai_client
+from instrumentation import METRICS, collect
 import os
+import time
 import json
 import argparse
-from youtube_uploader import upload_to_youtube
-from instagram_uploader import upload_to_instagram
+import multiprocessing
+from publishing import publish, selected_platforms, all_published
 
 def create_output_directory():
     # Get the base directory where the script is located
@@ -20,6 +27,12 @@ def create_output_directory():
     # Create timestamped subdirectory
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_dir = os.path.join(output_base, timestamp)
+    
+    # Batch runs can start several ideas within the same second
+    suffix = 2
+    while os.path.exists(output_dir):
+        output_dir = os.path.join(output_base, f"{timestamp}_{suffix}")
+        suffix += 1
     os.makedirs(output_dir)
     
     return output_dir
@@ -30,8 +43,14 @@ def load_existing_content(folder_path):
         return json.load(f)
 
 def get_newest_video(folder_path):
-    """Find the newest video file in the specified folder"""
-    video_files = [f for f in os.listdir(folder_path) if f.endswith(('.mp4', '.mov', '.avi'))]
+    """Find the newest video file in the specified folder (draft previews are skipped)"""
+    # The catalog knows without listing the folder
+    video_path = shared_catalog().newest_video(folder_path)
+    if video_path and os.path.exists(video_path):
+        return video_path
+
+    video_files = [f for f in os.listdir(folder_path)
+                   if f.endswith(('.mp4', '.mov', '.avi')) and not f.startswith('preview_')]
     if not video_files:
         raise ValueError(f"No video files found in {folder_path}")
     
@@ -43,18 +62,333 @@ def append_transparency_clause(description):
     transparency_clause = "\nThis video was created with AI assistance. Learn more about the process: https://github.com/esper6/bettermentbotique"
     return description + transparency_clause
 
+def save_content(content, output_dir):
+    """Write content.json and the social media description for a run"""
+    # Save content to JSON
+    with open(os.path.join(output_dir, "content.json"), "w") as f:
+        json.dump(content, f, indent=4)
+        
+    # Save description separately for easy access
+    with open(os.path.join(output_dir, "social_description.txt"), "w") as f:
+        f.write(content['description'])
+
+def load_ideas(ideas_file):
+    """One idea per line; blank lines and lines starting with # are skipped"""
+    with open(ideas_file, 'r') as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+def timed(stage, *args, **kwargs):
+    """Run a stage function and return (seconds, result)"""
+    start = time.perf_counter()
+    result = stage(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+# Input keys of each stage in a run's manifest.json (see run_auto)
+def script_inputs(idea):
+    return cache_key(idea, SCRIPT_MODEL, PROMPT_TEMPLATE_HASH)
+
+def image_inputs(content):
+    return cache_key(content['image_prompts'], IMAGE_MODEL, IMAGE_SIZE, IMAGE_QUALITY)
+
+def audio_inputs(content, tts_sentences):
+    return cache_key(content['script'], TTS_MODEL, TTS_VOICE, tts_sentences)
+
+def record_images(manifest, content, images):
+    """
+    Record the images stage; with prompts missing it is recorded without an
+    input key, so it is never fresh and the next run retries them (the images
+    that did succeed come back from the image cache)
+    """
+    complete = len(images) == len(content['image_prompts'])
+    if not complete:
+        print(f"⚠ Only {len(images)} of {len(content['image_prompts'])} images were generated; "
+              "the rest are retried on the next run")
+    manifest.record('images', image_inputs(content) if complete else None, images)
+
+def render_stage_name(preview):
+    return 'preview' if preview else 'render'
+
+def render_inputs(manifest, assets, content, duck_music, preview, preview_duration, encoder):
+    """The render depends on the exact image and audio files plus every render option"""
+    images, audio_path = assets
+    settings = PREVIEW_SETTINGS if preview else RENDER_SETTINGS
+    return cache_key(
+        manifest.hashes(images), manifest.hashes([audio_path]),
+        content['script'], content['title'], settings, preview_duration if preview else None,
+        duck_music, encoder)
+
+def script_stage(idea, client, cache):
+    content = generate_script(idea, client=client, cache=cache)
+    content['description'] = append_transparency_clause(content['description'])
+    output_dir = create_output_directory()
+    save_content(content, output_dir)
+    shared_catalog().record_run(output_dir, idea=idea, title=content['title'])
+    RunManifest(output_dir).record('script', script_inputs(idea),
+                                   [os.path.join(output_dir, "content.json")])
+    return content, output_dir
+
+def generate_assets(content, output_dir, image_workers, tts_sentences=False):
+    """Generate images and narration together; TTS runs while images are generated"""
+    with ThreadPoolExecutor(max_workers=1) as tts_pool:
+        audio_future = tts_pool.submit(generate_audio, content['script'], output_dir,
+                                       split_sentences=tts_sentences)
+        images, _ = get_images(content['image_prompts'], output_dir, max_workers=image_workers)
+        audio_path = audio_future.result()
+    return images, audio_path
+
+def image_stage(content, output_dir, image_workers, tts_sentences):
+    catalog = shared_catalog()
+    with catalog.stage(output_dir, 'images'):
+        images, audio_path = generate_assets(content, output_dir, image_workers, tts_sentences)
+        if not images:
+            raise RuntimeError("No images were generated")
+    catalog.record_assets(output_dir, 'image', images)
+    catalog.record_assets(output_dir, 'audio', [audio_path])
+    manifest = RunManifest(output_dir)
+    record_images(manifest, content, images)
+    manifest.record('audio', audio_inputs(content, tts_sentences), [audio_path])
+    return images, audio_path
+
+def encoder_options(args):
+    """Encoder overrides from the command line (None keeps the render default)"""
+    return dict(preset=args.encoder_preset, crf=args.crf, threads=args.encoder_threads)
+
+def render_stage(assets, content, output_dir, render_workers, duck_music=False, preview=False,
+                 preview_duration=None, frame_threads=2, encoder=None):
+    images, audio_path = assets
+    catalog = shared_catalog()
+    with catalog.stage(output_dir, 'render', final=True):
+        seconds, video_path = timed(
+            create_video, images=images, script_text=content['script'], output_dir=output_dir,
+            title=content['title'], render_workers=render_workers,
+            audio_path=audio_path, duck_music=duck_music, preview=preview,
+            preview_duration=preview_duration, frame_threads=frame_threads,
+            encoder=encoder)
+    catalog.record_assets(output_dir, 'preview' if preview else 'video', [video_path],
+                          render_seconds=round(seconds, 2))
+    manifest = RunManifest(output_dir)
+    manifest.record(render_stage_name(preview),
+                    render_inputs(manifest, assets, content, duck_music, preview, preview_duration,
+                                  encoder),
+                    [video_path])
+    return video_path
+
+def upload_stage(video_path, output_dir, platform, privacy):
+    catalog = shared_catalog()
+    results = publish(video_path, output_dir, selected_platforms(platform), privacy=privacy)
+    catalog.record_uploads(output_dir, video_path, results)
+    if all_published(results):
+        catalog.set_status(output_dir, 'done', 'upload')
+    else:
+        catalog.set_status(output_dir, 'failed', 'upload',
+                           '; '.join(f"{p}: {r['error']}" for p, r in results.items() if r['error']))
+    return results
+
+def print_publish_results(results):
+    for platform, record in results.items():
+        if record['status'] == 'published':
+            print(f"{platform}: published {record['url']}")
+        else:
+            print(f"{platform}: failed ({record['error']}); run upload-only again to retry")
+
+def run_batch(ideas, args):
+    """
+    Run many ideas through script -> images -> render -> upload as a pipeline.
+
+    Each stage has its own pool, so network-bound script and image work for
+    later ideas overlaps with CPU-bound rendering of earlier ones, and
+    uploads overlap with later renders. Returns one summary record per idea.
+    """
+    client = shared_openai_client()
+    script_cache = AssetCache("scripts", SCRIPT_CACHE_MAX_BYTES, suffix=".json")
+
+    summary = [{'idea': idea, 'status': 'pending', 'stage_seconds': {}} for idea in ideas]
+    pools = {
+        'script': ThreadPoolExecutor(max_workers=args.script_jobs),
+        'images': ThreadPoolExecutor(max_workers=args.image_jobs),
+        # Spawned, not forked: the script and image threads (and the HTTP and
+        # cache locks they hold) are running while render workers start
+        'render': ProcessPoolExecutor(max_workers=args.render_jobs,
+                                      mp_context=multiprocessing.get_context('spawn')),
+        'upload': ThreadPoolExecutor(max_workers=args.upload_jobs),
+    }
+    pending = {}
+
+    def submit(i, stage, fn, *stage_args):
+        summary[i]['status'] = stage
+        pending[pools[stage].submit(timed, fn, *stage_args)] = (i, stage)
+
+    try:
+        for i, idea in enumerate(ideas):
+            submit(i, 'script', script_stage, idea, client, script_cache)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, stage = pending.pop(future)
+                record = summary[i]
+                try:
+                    seconds, result = future.result()
+                except Exception as e:
+                    print(f"\n❌ Idea {i + 1} failed during {stage}: {e}")
+                    record.update(status='failed', failed_stage=stage, error=str(e))
+                    if 'output_dir' in record:
+                        shared_catalog().set_status(record['output_dir'], 'failed', stage, str(e))
+                    continue
+                record['stage_seconds'][stage] = round(seconds, 2)
+                print(f"\n✓ Idea {i + 1}/{len(ideas)}: {stage} done in {seconds:.1f}s")
+
+                if stage == 'script':
+                    content, output_dir = result
+                    record.update(title=content['title'], output_dir=output_dir, _content=content)
+                    submit(i, 'images', image_stage, content, output_dir, args.image_workers,
+                           args.tts_sentences)
+                elif stage == 'images':
+                    # Renders run in another process; their metrics come back with the result
+                    submit(i, 'render', collect, render_stage, result, record['_content'],
+                           record['output_dir'], args.render_workers, args.duck_music,
+                           args.preview, args.preview_duration, args.frame_threads,
+                           encoder_options(args))
+                elif stage == 'render':
+                    result, metrics = result
+                    METRICS.merge(metrics)
+                    record['video_path'] = result
+                    if args.upload and not args.preview:
+                        submit(i, 'upload', upload_stage, result, record['output_dir'],
+                               args.platform, args.privacy)
+                    else:
+                        record['status'] = 'done'
+                elif stage == 'upload':
+                    record['uploads'] = result
+                    if all_published(result):
+                        record['status'] = 'done'
+                    else:
+                        record.update(status='failed', failed_stage='upload',
+                                      error='; '.join(f"{p}: {r['error']}" for p, r in result.items()
+                                                      if r['error']))
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+
+    for record in summary:
+        record.pop('_content', None)
+    return summary
+
+def run_auto(args):
+    """
+    Bring a run folder up to date, rebuilding only stages whose inputs changed.
+
+    Every stage's inputs and outputs are recorded in the folder's
+    manifest.json. A stage reruns when its inputs differ from the last run
+    (an edited content.json, a new idea, other render options) or when one
+    of its outputs was removed or modified; everything else is skipped.
+    """
+    output_dir = args.folder or create_output_directory()
+    manifest = RunManifest(output_dir)
+    content_path = os.path.join(output_dir, "content.json")
+    rebuilt, skipped = [], []
+
+    # Script: from --idea, or whatever content.json holds (it may be hand-edited)
+    if args.idea:
+        script_key = script_inputs(args.idea)
+        if manifest.is_fresh('script', script_key):
+            skipped.append('script')
+        else:
+            print(f"\nGenerating content for idea: {args.idea}")
+            content = generate_script(args.idea)
+            content['description'] = append_transparency_clause(content['description'])
+            save_content(content, output_dir)
+            shared_catalog().record_run(output_dir, idea=args.idea, title=content['title'])
+            manifest.record('script', script_key, [content_path])
+            rebuilt.append('script')
+    elif not os.path.exists(content_path):
+        raise ValueError("For auto mode, provide --idea or a --folder that contains content.json")
+    content = load_existing_content(output_dir)
+    description_path = os.path.join(output_dir, "social_description.txt")
+    with open(description_path, "w") as f:
+        f.write(content['description'])
+
+    # Images and narration only depend on the script, and run side by side
+    image_key = image_inputs(content)
+    audio_key = audio_inputs(content, args.tts_sentences)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = {}
+        if manifest.is_fresh('images', image_key):
+            skipped.append('images')
+        else:
+            futures['images'] = pool.submit(get_images, content['image_prompts'], output_dir,
+                                            max_workers=args.image_workers)
+        if manifest.is_fresh('audio', audio_key):
+            skipped.append('audio')
+        else:
+            futures['audio'] = pool.submit(generate_audio, content['script'], output_dir,
+                                           split_sentences=args.tts_sentences)
+        if 'images' in futures:
+            images, _ = futures['images'].result()
+            if not images:
+                raise RuntimeError("No images were generated")
+            record_images(manifest, content, images)
+            shared_catalog().record_assets(output_dir, 'image', images)
+            rebuilt.append('images')
+        if 'audio' in futures:
+            audio_path = futures['audio'].result()
+            manifest.record('audio', audio_key, [audio_path])
+            shared_catalog().record_assets(output_dir, 'audio', [audio_path])
+            rebuilt.append('audio')
+
+    # render_stage records the render in the manifest under the same key
+    stage_name = render_stage_name(args.preview)
+    assets = (manifest.outputs('images'), manifest.outputs('audio')[0])
+    render_key = render_inputs(manifest, assets, content, args.duck_music, args.preview,
+                               args.preview_duration, encoder_options(args))
+    if manifest.is_fresh(stage_name, render_key):
+        skipped.append(stage_name)
+        video_path = manifest.outputs(stage_name)[0]
+    else:
+        video_path = render_stage(assets, content, output_dir, args.render_workers, args.duck_music,
+                                  args.preview, args.preview_duration, args.frame_threads,
+                                  encoder_options(args))
+        rebuilt.append(stage_name)
+
+    print(f"\nRebuilt: {', '.join(rebuilt) or 'nothing'}")
+    print(f"Up to date, skipped: {', '.join(skipped) or 'nothing'}")
+    print("Video:", video_path)
+
+    if args.upload and not args.preview:
+        # publish.json already skips platforms that have this exact video
+        print_publish_results(upload_stage(video_path, output_dir, args.platform, args.privacy))
+    return video_path
+
+def write_run_report(output_dir, prometheus_path=None):
+    """Save the collected metrics as run_report.json (and a Prometheus textfile if asked)"""
+    if output_dir:
+        report_path = os.path.join(output_dir, "run_report.json")
+    else:
+        report_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output_videos",
+                                   f"run_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    METRICS.write_json(report_path)
+    print("Run report saved to:", report_path)
+    if prometheus_path:
+        METRICS.write_prometheus(prometheus_path)
+        print("Prometheus metrics saved to:", prometheus_path)
+
 def main():
     parser = argparse.ArgumentParser(description='Social Media Video Generator')
     parser.add_argument('--mode', 
-                       choices=['full', 'video-only', 'script-only', 'image-only', 'upload-only'],
+                       choices=['full', 'video-only', 'script-only', 'image-only', 'upload-only', 'batch',
+                                'auto', 'upload-pending'],
                        default='full',
                        help='full: generate everything, video-only: create new video from existing content, '
                             'script-only: generate script only, image-only: generate images from existing script, '
-                            'upload-only: upload existing video from folder')
+                            'upload-only: upload existing video from folder, '
+                            'batch: run every idea in --ideas-file through the full pipeline, '
+                            'auto: rebuild only what changed in --folder (or a new run for --idea), '
+                            'upload-pending: publish every rendered video not yet on --platform')
     parser.add_argument('--folder', help='Path to existing timestamped folder')
     parser.add_argument('--idea', help='Idea for the video (required for full and script-only mode)', default=None)
     parser.add_argument('--upload', action='store_true', 
-                       help='Upload the video to YouTube after creation')
+                       help='Publish the video to --platform after creation')
     parser.add_argument('--privacy', 
                        choices=['private', 'public', 'unlisted'],
                        default='private',
@@ -63,8 +397,83 @@ def main():
                        choices=['youtube', 'instagram', 'all'],
                        default='youtube',
                        help='Platform to upload to (youtube, instagram, or all)')
+    parser.add_argument('--image-workers', type=int, default=4,
+                       help='Number of images to generate at the same time')
+    parser.add_argument('--tts-sentences', action='store_true',
+                       help='Synthesize narration sentence by sentence in parallel and stitch it together '
+                            '(writes sentence timings to tts_offsets.json)')
+    parser.add_argument('--render-workers', type=int, default=1,
+                       help='Render the video in this many parallel segments (1 renders serially)')
+    parser.add_argument('--duck-music', action='store_true',
+                       help='Lower the background music while the narrator is speaking')
+    parser.add_argument('--preview', action='store_true',
+                       help='Render a fast low-resolution draft (preview_*.mp4) instead of the final video; '
+                            'previews are never uploaded')
+    parser.add_argument('--preview-duration', type=float, default=None,
+                       help='With --preview, only render the first this many seconds')
+    parser.add_argument('--frame-threads', type=int, default=2,
+                       help='Threads drawing frames while ffmpeg encodes (serial render)')
+    parser.add_argument('--encoder-preset', default=None,
+                       help='libx264 preset, e.g. veryfast or slow (default medium, ultrafast for previews)')
+    parser.add_argument('--crf', type=int, default=None,
+                       help='libx264 constant quality (e.g. 18-28) instead of a fixed bitrate')
+    parser.add_argument('--encoder-threads', type=int, default=None,
+                       help='Threads ffmpeg may use for encoding (default: ffmpeg decides)')
+    parser.add_argument('--ideas-file', help='Text file with one idea per line (required for batch mode)')
+    parser.add_argument('--script-jobs', type=int, default=4,
+                       help='Batch mode: ideas generating scripts at the same time')
+    parser.add_argument('--image-jobs', type=int, default=2,
+                       help='Batch mode: ideas generating images at the same time')
+    parser.add_argument('--render-jobs', type=int, default=1,
+                       help='Batch mode: videos rendering at the same time (separate processes)')
+    parser.add_argument('--upload-jobs', type=int, default=2,
+                       help='Batch mode: videos uploading at the same time')
+    parser.add_argument('--prometheus', metavar='PATH', default=None,
+                       help='Also write the run metrics to PATH in the Prometheus textfile format '
+                            '(e.g. for the node_exporter textfile collector)')
     args = parser.parse_args()
 
+    # The report is written even when a stage fails, so slow or failing runs can be compared
+    output_dir = None
+    try:
+        output_dir = run_mode(args)
+    finally:
+        write_run_report(output_dir, args.prometheus)
+
+def run_mode(args):
+    """Run the selected --mode; returns the run folder it worked in, if there is one"""
+
+    if args.mode == 'batch':
+        if not args.ideas_file:
+            raise ValueError("For batch mode, you must provide --ideas-file")
+        
+        ideas = load_ideas(args.ideas_file)
+        print(f"\nRunning batch of {len(ideas)} ideas...")
+        summary = run_batch(ideas, args)
+        
+        summary_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output_videos",
+                                    f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        os.makedirs(os.path.dirname(summary_path), exist_ok=True)
+        with open(summary_path, "w") as f:
+            json.dump(summary, f, indent=4)
+        
+        succeeded = sum(1 for record in summary if record['status'] == 'done')
+        print(f"\nBatch complete: {succeeded}/{len(summary)} ideas succeeded")
+        print("Summary saved to:", summary_path)
+        return None
+
+    if args.mode == 'auto':
+        return os.path.dirname(run_auto(args))
+
+    if args.mode == 'upload-pending':
+        pending = shared_catalog().unpublished(selected_platforms(args.platform))
+        print(f"\n{len(pending)} rendered videos still to publish")
+        for row in pending:
+            print(f"\nPublishing {row['video_path']}...")
+            print_publish_results(upload_stage(row['video_path'], row['run_dir'], args.platform,
+                                               args.privacy))
+        return None
+
     # Add upload-only mode
     if args.mode == 'upload-only':
         if not args.folder:
@@ -73,46 +482,31 @@ def main():
         video_path = get_newest_video(args.folder)
         print(f"\nFound newest video: {video_path}")
         
-        if args.platform in ['youtube', 'all']:
-            video_id = upload_to_youtube(video_path, args.folder, privacy_status=args.privacy)
-            if video_id:
-                print(f"YouTube upload successful! Video ID: {video_id}")
-        
-        if args.platform in ['instagram', 'all']:
-            if upload_to_instagram(video_path, args.folder):
-                print("Instagram upload successful!")
-        return
+        # Platforms that already have this video are skipped, so a rerun
+        # only retries the ones that failed
+        results = upload_stage(video_path, args.folder, args.platform, args.privacy)
+        print_publish_results(results)
+        return args.folder
 
     if args.mode in ['full', 'script-only']:
         if not args.idea:
             raise ValueError("For full and script-only modes, --idea argument is required")
         
         print(f"\nGenerating content for idea: {args.idea}")
-        output_dir = create_output_directory()
-        
-        # Generate script and content
-        content = generate_script(args.idea)
         
-        # Add transparency clause to description
-        content['description'] = append_transparency_clause(content['description'])
+        # Generate script and content (with the transparency clause) into a new run folder
+        content, output_dir = script_stage(args.idea, None, None)
         
         print("\nGenerated Content:")
         print(json.dumps(content, indent=2))
-        
-        # Save content to JSON
-        with open(os.path.join(output_dir, "content.json"), "w") as f:
-            json.dump(content, f, indent=4)
-            
-        # Save description separately for easy access
-        with open(os.path.join(output_dir, "social_description.txt"), "w") as f:
-            f.write(content['description'])
             
         if args.mode == 'script-only':
             print(f"\nScript generation complete! Files saved in: {output_dir}")
-            return
+            return output_dir
         
-        # Continue with full mode
-        images, sources_path = get_images(content['image_prompts'], output_dir)
+        # Continue with full mode; narration is synthesized alongside the images
+        images, audio_path = image_stage(content, output_dir, args.image_workers,
+                                         args.tts_sentences)
         
     elif args.mode == 'image-only':
         if not args.folder:
@@ -120,8 +514,9 @@ def main():
         
         # Load existing content
         content = load_existing_content(args.folder)
-        images, sources_path = get_images(content['image_prompts'], args.folder)
-        return
+        images, sources_path = get_images(content['image_prompts'], args.folder,
+                                         max_workers=args.image_workers)
+        return args.folder
         
     elif args.mode == 'video-only':
         if not args.folder:
@@ -137,14 +532,32 @@ def main():
                  if f.endswith(('.png', '.jpg', '.jpeg'))]
         
         print(f"Loaded {len(images)} images from {images_dir}")
+        
+        # Reuse the folder's narration unless the manifest shows it was made
+        # for another script; otherwise it is served from the TTS cache when it can be
+        audio_path = os.path.join(output_dir, "tts_audio.mp3")
+        manifest = RunManifest(output_dir)
+        audio_key = audio_inputs(content, args.tts_sentences)
+        if os.path.exists(audio_path) and ('audio' not in manifest.stages
+                                           or manifest.is_fresh('audio', audio_key)):
+            print(f"Using existing narration: {audio_path}")
+        else:
+            audio_path = generate_audio(content['script'], output_dir,
+                                        split_sentences=args.tts_sentences)
+            manifest.record('audio', audio_key, [audio_path])
     
     # Create video for full and video-only modes
     if args.mode in ['full', 'video-only']:
-        video_path = create_video(
-            images=images, 
-            script_text=content['script'], 
-            output_dir=output_dir,
-            title=content['title']
+        video_path = render_stage(
+            (images, audio_path),
+            content,
+            output_dir,
+            render_workers=args.render_workers,
+            duck_music=args.duck_music,
+            preview=args.preview,
+            preview_duration=args.preview_duration,
+            frame_threads=args.frame_threads,
+            encoder=encoder_options(args)
         )
         print("\nVideo created successfully")
         print("Video saved to:", video_path)
@@ -157,14 +570,13 @@ def main():
         
         print(f"\nAll files saved in: {output_dir}")
         
-        if args.upload:
-            print("\nUploading to YouTube...")
-            video_id = upload_to_youtube(video_path, output_dir)
-            if video_id:
-                print(f"Upload successful! Video ID: {video_id}")
-    
-    # Step 4 (Optional): Add audio
-    # generate_audio(content['script'])
+        if args.upload and args.preview:
+            print("\nSkipping upload for a preview render; run video-only without --preview to publish")
+        elif args.upload:
+            print(f"\nPublishing to {args.platform}...")
+            results = upload_stage(video_path, output_dir, args.platform, args.privacy)
+            print_publish_results(results)
+    return output_dir
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,118 @@
+import os
+import json
+import random
+import numpy as np
+from asset_cache import CACHE_ROOT, cache_key
+from audio_utils import AUDIO_FPS, decode_audio, rms
+
+SONGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "songs")
+SONG_EXTENSIONS = ('.mp3', '.wav', '.m4a')
+
+class MusicLibrary:
+    """
+    Index of the background music folder with decoded PCM kept on disk.
+
+    Each track is decoded once to an int16 .npy file next to index.json and
+    re-decoded only when its size or mtime changes. Picking, looping and
+    trimming a track is then slicing a memory-mapped array, no decode per run.
+    PCM files are never rewritten in place (other renders may have them
+    mapped): a changed song gets a new file and the old one is unlinked.
+    """
+
+    def __init__(self, songs_dir=SONGS_DIR, index_dir=None, fps=AUDIO_FPS):
+        self.songs_dir = songs_dir
+        self.index_dir = index_dir or os.path.join(CACHE_ROOT, "music")
+        self.index_path = os.path.join(self.index_dir, "index.json")
+        self.fps = fps
+        self.tracks = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as f:
+                self.tracks = json.load(f)
+
+    def refresh(self):
+        """Bring the index up to date with the songs folder; returns it"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        song_files = []
+        if os.path.isdir(self.songs_dir):
+            song_files = [f for f in os.listdir(self.songs_dir) if f.endswith(SONG_EXTENSIONS)]
+
+        changed = False
+        for name in song_files:
+            stat = os.stat(os.path.join(self.songs_dir, name))
+            entry = self.tracks.get(name)
+            if (entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size
+                    and entry['fps'] == self.fps
+                    and os.path.exists(os.path.join(self.index_dir, entry['pcm']))):
+                continue
+            print(f"Indexing background music: {name}")
+            self.tracks[name] = self._analyze(name, stat)
+            if entry and entry['pcm'] != self.tracks[name]['pcm']:
+                self._remove_pcm(entry['pcm'])
+            changed = True
+
+        # Forget songs that were removed from the folder
+        for name in set(self.tracks) - set(song_files):
+            self._remove_pcm(self.tracks.pop(name)['pcm'])
+            changed = True
+
+        if changed:
+            temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(self.tracks, f, indent=4)
+            os.replace(temp_path, self.index_path)
+        return self.tracks
+
+    def _remove_pcm(self, pcm_name):
+        # Renders that still map the file keep their data until they're done
+        try:
+            os.remove(os.path.join(self.index_dir, pcm_name))
+        except FileNotFoundError:
+            pass
+
+    def _analyze(self, name, stat):
+        samples = decode_audio(os.path.join(self.songs_dir, name), self.fps)
+        level = rms(samples)
+        # Named after this exact version of the song, so a re-index writes a new file
+        pcm_name = cache_key(name, stat.st_size, stat.st_mtime, self.fps)[:40] + ".npy"
+        pcm_path = os.path.join(self.index_dir, pcm_name)
+        # Written whole before it appears, as other processes may be indexing too
+        temp_path = f"{pcm_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.save(f, (np.clip(samples, -1, 1) * 32767).astype(np.int16))
+        os.replace(temp_path, pcm_path)
+        return {
+            'file': name,
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'fps': self.fps,
+            'duration': len(samples) / self.fps,
+            'loudness_dbfs': round(20 * np.log10(level), 2) if level > 0 else None,
+            'pcm': pcm_name,
+        }
+
+    def choose(self, rng=random):
+        """Random track entry, or None when the library is empty"""
+        if not self.tracks:
+            return None
+        return self.tracks[rng.choice(sorted(self.tracks))]
+
+    def load(self, track):
+        """Memory-mapped int16 PCM of a track"""
+        return np.load(os.path.join(self.index_dir, track['pcm']), mmap_mode='r')
+
+    def samples_for(self, track, n_samples):
+        """Exactly n_samples of the track as float32, looping it if it's too short"""
+        pcm = self.load(track)
+        if not len(pcm):
+            return np.zeros((n_samples, 2), dtype=np.float32)
+        if n_samples <= len(pcm):
+            return pcm[:n_samples].astype(np.float32) / 32767
+        indices = np.arange(n_samples) % len(pcm)
+        return pcm[indices].astype(np.float32) / 32767
+
+if __name__ == "__main__":
+    library = MusicLibrary()
+    tracks = library.refresh()
+    print(f"{len(tracks)} tracks indexed in {library.index_dir}")
+    for track in sorted(tracks.values(), key=lambda t: t['file']):
+        print(f"  {track['file']}: {track['duration']:.1f}s, {track['loudness_dbfs']} dBFS")
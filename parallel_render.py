@@ -0,0 +1,94 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from moviepy.config import get_setting
+from frame_pipeline import FramePipeline, frame_count
+from instrumentation import METRICS, collect
+
+def plan_segments(boundaries, duration, fps, n_segments):
+    """
+    Split [0, duration) into up to n_segments frame ranges.
+
+    Each cut is snapped to the layer boundary (clip start/end or transition)
+    nearest to an even split, so segments line up with the edit.
+    Returns a list of (first_frame, end_frame) pairs.
+    """
+    total_frames = frame_count(duration, fps)
+    boundary_frames = sorted({int(round(b * fps)) for b in boundaries
+                              if 0 < int(round(b * fps)) < total_frames})
+    cuts = set()
+    for i in range(1, n_segments):
+        if not boundary_frames:
+            break
+        target = total_frames * i / n_segments
+        cuts.add(min(boundary_frames, key=lambda f: abs(f - target)))
+    edges = [0] + sorted(cuts) + [total_frames]
+    return list(zip(edges[:-1], edges[1:]))
+
+def _render_segment(build_timeline, timeline_args, first_frame, end_frame, segment_path,
+                    fps, encoder):
+    """Worker: rebuild the timeline and encode one range of frames"""
+    with METRICS.timer('render.setup'):
+        clip = build_timeline(**timeline_args)
+    # One producer per process; it still overlaps drawing with encoding
+    return FramePipeline(clip, fps, producers=1).write(segment_path, first_frame, end_frame,
+                                                       **encoder)
+
+def concat_segments(segment_paths, audio_path, output_path):
+    """Join encoded segments without re-encoding and mux the audio track"""
+    list_path = os.path.join(os.path.dirname(segment_paths[0]), "segments.txt")
+    with open(list_path, "w") as f:
+        for path in segment_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+
+    cmd = [get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+           "-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_path:
+        cmd += ["-i", audio_path, "-map", "0:v", "-map", "1:a"]
+    cmd += ["-c", "copy", output_path]
+    subprocess.run(cmd, check=True)
+
+def render_parallel(build_timeline, timeline_args, audio_path, output_path, fps, workers,
+                    **encoder):
+    """
+    Render a timeline in time segments across worker processes.
+
+    Every worker rebuilds the timeline from `timeline_args` (which must fix
+    the random seed) and encodes its own frame range. The segments are then
+    concatenated without re-encoding and the already encoded audio track is
+    muxed in.
+
+    The frames sent to the encoder are identical to the serial path's, but
+    the encoded stream is not: each segment starts on a keyframe and runs
+    its own rate control. With a bitrate, every segment averages that
+    bitrate by itself instead of the encoder spreading bits over the whole
+    video, so quality can step at the cuts; crf keeps it consistent.
+    """
+    with METRICS.timer('render.setup'):
+        timeline = build_timeline(**timeline_args)
+    segments = plan_segments(timeline.layer_boundaries(), timeline.duration, fps, workers)
+    print(f"Rendering {len(segments)} segments with {workers} workers...")
+
+    work_dir = tempfile.mkdtemp(prefix="render_", dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(collect, _render_segment, build_timeline, timeline_args, first, end,
+                            os.path.join(work_dir, f"segment_{i:03d}.mp4"), fps, encoder)
+                for i, (first, end) in enumerate(segments)
+            ]
+            segment_paths = []
+            for i, future in enumerate(futures):
+                # Bring the worker's frame timings back into this process
+                segment_path, metrics = future.result()
+                METRICS.merge(metrics)
+                segment_paths.append(segment_path)
+                print(f"Segment {i + 1}/{len(segments)} done")
+
+        with METRICS.timer('render.concat'):
+            concat_segments(segment_paths, audio_path, output_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return output_path
@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from youtube_uploader import upload_to_youtube
+from instagram_uploader import upload_to_instagram
+from instrumentation import METRICS
+
+PLATFORMS = ['youtube', 'instagram']
+PUBLISH_FILE = "publish.json"
+
+def selected_platforms(platform):
+    """Platforms for a --platform value ('all' or a single name)"""
+    return list(PLATFORMS) if platform == 'all' else [platform]
+
+def load_publish_log(content_dir):
+    path = os.path.join(content_dir, PUBLISH_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def _upload(platform, video_path, content_dir, privacy):
+    """Upload to one platform; returns (id, url) and raises on failure"""
+    if platform == 'youtube':
+        def progress(sent, total):
+            print(f"[youtube] {sent / 1e6:.1f}/{total / 1e6:.1f} MB ({100 * sent / total:.0f}%)")
+        video_id = upload_to_youtube(video_path, content_dir, privacy_status=privacy,
+                                     progress=progress, raise_errors=True)
+        return video_id, f"https://youtu.be/{video_id}"
+    if platform == 'instagram':
+        code = upload_to_instagram(video_path, content_dir, raise_errors=True)
+        return code, f"https://www.instagram.com/p/{code}/"
+    raise ValueError(f"Unknown platform: {platform}")
+
+def publish(video_path, content_dir, platforms, privacy="private", force=False):
+    """
+    Upload one video to several platforms at the same time.
+
+    Each platform's outcome (id, url, duration, throughput or error) is
+    written to publish.json in content_dir as soon as it finishes. Platforms
+    that already published this same video file are skipped unless `force`,
+    so running it again only retries the ones that failed. Returns the
+    per-platform records.
+    """
+    log = load_publish_log(content_dir)
+    log_path = os.path.join(content_dir, PUBLISH_FILE)
+    log_lock = threading.Lock()
+    video_file = os.path.basename(video_path)
+    size = os.path.getsize(video_path)
+
+    todo = []
+    for platform in platforms:
+        previous = log.get(platform)
+        if not force and previous and previous['status'] == 'published' \
+                and previous['video_file'] == video_file:
+            print(f"[{platform}] Already published: {previous['url']}")
+        else:
+            todo.append(platform)
+
+    def publish_one(platform):
+        print(f"[{platform}] Uploading {video_file} ({size / 1e6:.1f} MB)...")
+        start = time.time()
+        record = {'video_file': video_file, 'bytes': size}
+        try:
+            media_id, url = _upload(platform, video_path, content_dir, privacy)
+            seconds = time.time() - start
+            METRICS.observe(f'upload.{platform}', seconds)
+            METRICS.add(f'upload.{platform}.bytes', size)
+            record.update(status='published', id=media_id, url=url, seconds=round(seconds, 2),
+                          bytes_per_sec=round(size / seconds) if seconds > 0 else None, error=None)
+            print(f"[{platform}] Published in {seconds:.1f}s: {url}")
+        except Exception as e:
+            record.update(status='failed', id=None, url=None,
+                          seconds=round(time.time() - start, 2), bytes_per_sec=None, error=str(e))
+            METRICS.add(f'upload.{platform}.failures')
+            print(f"[{platform}] Failed: {e}")
+        record['finished_at'] = datetime.now().isoformat(timespec='seconds')
+
+        with log_lock:
+            log[platform] = record
+            temp_path = f"{log_path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(log, f, indent=4)
+            os.replace(temp_path, log_path)
+        return record
+
+    if todo:
+        with ThreadPoolExecutor(max_workers=len(todo)) as pool:
+            list(pool.map(publish_one, todo))
+    return {platform: log[platform] for platform in platforms}
+
+def all_published(results):
+    return all(record['status'] == 'published' for record in results.values())
@@ -0,0 +1,296 @@
+import os
+import json
+import time
+import random
+import shutil
+import tempfile
+import requests
+from instrumentation import METRICS
+
+# Override to point uploads at a test endpoint (see check_fake_endpoint)
+UPLOAD_URL = os.getenv('YOUTUBE_UPLOAD_URL', "https://www.googleapis.com/upload/youtube/v3/videos")
+
+# Chunks must be a multiple of 256 KB; bigger chunks mean fewer requests,
+# smaller ones less to resend after a failure
+CHUNK_GRANULARITY = 256 * 1024
+DEFAULT_CHUNK_SIZE = int(os.getenv('YOUTUBE_CHUNK_SIZE', 8 * 1024 * 1024))
+
+MAX_ATTEMPTS = 8
+RETRY_BASE_DELAY = 1  # seconds, doubled after every failed attempt
+RETRY_MAX_DELAY = 60
+
+RETRIABLE_STATUS_CODES = (500, 502, 503, 504)
+RETRIABLE_ERRORS = (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)
+
+class UploadError(Exception):
+    pass
+
+class RetriableUploadError(UploadError):
+    pass
+
+class SessionExpiredError(UploadError):
+    pass
+
+def print_progress(sent, total):
+    print(f"Uploaded {sent / 1e6:.1f} of {total / 1e6:.1f} MB ({100 * sent / total:.0f}%)")
+
+class ResumableUpload:
+    """
+    Chunked upload using the resumable upload protocol of Google's APIs.
+
+    A session is opened with the metadata, then the file is sent in chunks
+    with Content-Range headers; the server answers 308 with the bytes it has
+    until the last chunk, which returns the created resource. Transient
+    failures are retried with exponential backoff after asking the server
+    how much it actually received.
+
+    The session URI is saved to `session_path`, so if the process dies the
+    next run with the same file picks up at the last stored byte instead of
+    starting over. `session` is anything with requests' post/put, e.g. a
+    google.auth AuthorizedSession, or a plain requests.Session for a local
+    fake endpoint.
+    """
+
+    def __init__(self, session, file_path, metadata, upload_url=UPLOAD_URL, params=None,
+                 session_path=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=print_progress,
+                 mime_type='video/*', max_attempts=MAX_ATTEMPTS, timeout=120):
+        self.session = session
+        self.file_path = file_path
+        self.metadata = metadata
+        self.upload_url = upload_url
+        self.params = params or {}
+        self.session_path = session_path
+        self.chunk_size = max(CHUNK_GRANULARITY, chunk_size // CHUNK_GRANULARITY * CHUNK_GRANULARITY)
+        self.progress = progress
+        self.mime_type = mime_type
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.total = os.path.getsize(file_path)
+        self.uri = None
+
+    def _fingerprint(self):
+        stat = os.stat(self.file_path)
+        return {'file': os.path.abspath(self.file_path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def _load_session(self):
+        """Session URI saved by an earlier run for this exact file, if any"""
+        if not self.session_path or not os.path.exists(self.session_path):
+            return None
+        with open(self.session_path, 'r') as f:
+            saved = json.load(f)
+        if saved.get('fingerprint') != self._fingerprint():
+            return None
+        return saved.get('uri')
+
+    def _save_session(self):
+        if self.session_path:
+            with open(self.session_path, 'w') as f:
+                json.dump({'uri': self.uri, 'fingerprint': self._fingerprint()}, f, indent=4)
+
+    def _clear_session(self):
+        if self.session_path and os.path.exists(self.session_path):
+            os.remove(self.session_path)
+
+    def _check(self, response):
+        if response.status_code in RETRIABLE_STATUS_CODES:
+            raise RetriableUploadError(f"HTTP {response.status_code}: {response.text[:200]}")
+        return response
+
+    def start(self):
+        """Open a new upload session and remember its URI"""
+        params = dict(self.params, uploadType='resumable')
+        response = self._check(self.session.post(
+            self.upload_url, params=params, json=self.metadata, timeout=self.timeout,
+            headers={'X-Upload-Content-Length': str(self.total),
+                     'X-Upload-Content-Type': self.mime_type}))
+        if response.status_code != 200 or 'Location' not in response.headers:
+            raise UploadError(f"Could not start upload (HTTP {response.status_code}): {response.text[:200]}")
+        self.uri = response.headers['Location']
+        self._save_session()
+
+    def _parse(self, response):
+        """(next byte offset, final resource or None) from a chunk or status response"""
+        if response.status_code in (200, 201):
+            return self.total, response.json()
+        if response.status_code == 308:
+            # Range: bytes=0-N means everything up to N is stored
+            stored = response.headers.get('Range')
+            return (int(stored.rsplit('-', 1)[1]) + 1 if stored else 0), None
+        if response.status_code in (404, 410):
+            raise SessionExpiredError("Upload session expired")
+        self._check(response)
+        raise UploadError(f"Upload failed (HTTP {response.status_code}): {response.text[:200]}")
+
+    def query_offset(self):
+        """Ask the server how many bytes of this session it has stored"""
+        response = self.session.put(self.uri, headers={'Content-Range': f'bytes */{self.total}'},
+                                    timeout=self.timeout)
+        return self._parse(response)
+
+    def send_chunk(self, f, offset):
+        f.seek(offset)
+        data = f.read(self.chunk_size)
+        end = offset + len(data) - 1
+        with METRICS.timer('api.upload_chunk'):
+            response = self.session.put(self.uri, data=data, timeout=self.timeout,
+                                        headers={'Content-Range': f'bytes {offset}-{end}/{self.total}'})
+        METRICS.add('api.upload_chunk.bytes', len(data))
+        return self._parse(response)
+
+    def run(self):
+        """Upload the whole file, resuming a saved session when possible; returns the resource"""
+        self.uri = self._load_session()
+        offset, result = 0, None
+        attempt = 0
+
+        with open(self.file_path, 'rb') as f:
+            while result is None:
+                try:
+                    if self.uri is None:
+                        self.start()
+                        offset = 0
+                    elif attempt or offset == 0:
+                        # Resuming, or recovering from a failure: sync with the server
+                        offset, result = self.query_offset()
+                        if offset:
+                            print(f"Resuming upload at {offset / 1e6:.1f} MB")
+                        if result is not None:
+                            break
+                    offset, result = self.send_chunk(f, offset)
+                    attempt = 0
+                    if self.progress:
+                        self.progress(offset, self.total)
+                except SessionExpiredError as e:
+                    print("Upload session expired, starting a new one")
+                    self._clear_session()
+                    self.uri = None
+                    attempt = self._backoff(e, attempt)
+                except (RetriableUploadError,) + RETRIABLE_ERRORS as e:
+                    attempt = self._backoff(e, attempt)
+
+        self._clear_session()
+        return result
+
+    def _backoff(self, error, attempt):
+        attempt += 1
+        METRICS.add('upload.retries')
+        if attempt >= self.max_attempts:
+            raise UploadError(f"Giving up after {attempt} attempts: {error}")
+        delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)) + random.uniform(0, 1)
+        print(f"Upload error ({error}), retrying in {delay:.1f}s...")
+        time.sleep(delay)
+        return attempt
+
+def fake_upload_server(fail_every=0):
+    """
+    Local stand-in for the resumable upload endpoint, on a free port.
+
+    Keeps every session's bytes in memory and answers 308 with a Range
+    header until the file is complete. With fail_every=n, every n-th chunk
+    is dropped with a 503. Returns (server, upload_url, stored bytes by
+    session id); call server.shutdown() when done.
+    """
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    sessions = {}
+    chunks = {'count': 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, headers=None, body=b''):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            session_id = str(len(sessions))
+            sessions[session_id] = bytearray()
+            host, port = self.server.server_address
+            self._reply(200, {'Location': f"http://{host}:{port}/session/{session_id}"})
+
+        def do_PUT(self):
+            stored = sessions.get(self.path.rsplit('/', 1)[-1])
+            if stored is None:
+                return self._reply(404)
+            data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            content_range = self.headers['Content-Range']
+            total = int(content_range.rsplit('/', 1)[1])
+            if not content_range.startswith('bytes */'):
+                chunks['count'] += 1
+                if fail_every and chunks['count'] % fail_every == 0:
+                    return self._reply(503)
+                start = int(content_range.split(' ')[1].split('-')[0])
+                del stored[start:]
+                stored.extend(data)
+            if len(stored) == total:
+                return self._reply(200, body=json.dumps({'id': f"fake{len(stored)}"}).encode())
+            self._reply(308, {'Range': f"bytes=0-{len(stored) - 1}"} if stored else {})
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/upload", sessions
+
+def check_fake_endpoint():
+    """
+    Upload through a fake endpoint that drops chunks with 503s, then kill an
+    upload midway and check the next run resumes its saved session
+    """
+    global RETRY_BASE_DELAY
+    base_delay, RETRY_BASE_DELAY = RETRY_BASE_DELAY, 0.01
+
+    class Interrupted(Exception):
+        pass
+
+    def interrupt_after(chunks):
+        sent = []
+        def progress(offset, total):
+            sent.append(offset)
+            if len(sent) == chunks:
+                raise Interrupted
+        return progress
+
+    work_dir = tempfile.mkdtemp(prefix="upload_check_")
+    server, upload_url, sessions = fake_upload_server(fail_every=3)
+    try:
+        file_path = os.path.join(work_dir, "video.mp4")
+        with open(file_path, 'wb') as f:
+            f.write(os.urandom(10 * CHUNK_GRANULARITY + 1234))
+        with open(file_path, 'rb') as f:
+            expected = f.read()
+        session_path = os.path.join(work_dir, "session.json")
+
+        result = ResumableUpload(requests.Session(), file_path, {}, upload_url=upload_url,
+                                 session_path=session_path, chunk_size=CHUNK_GRANULARITY,
+                                 progress=None).run()
+        assert bytes(sessions['0']) == expected and result['id'] == f"fake{len(expected)}"
+        print("✓ upload completed through injected 503s")
+
+        try:
+            ResumableUpload(requests.Session(), file_path, {}, upload_url=upload_url,
+                            session_path=session_path, chunk_size=CHUNK_GRANULARITY,
+                            progress=interrupt_after(4)).run()
+        except Interrupted:
+            pass
+        assert os.path.exists(session_path), "no session saved for the interrupted upload"
+        ResumableUpload(requests.Session(), file_path, {}, upload_url=upload_url,
+                        session_path=session_path, chunk_size=CHUNK_GRANULARITY,
+                        progress=None).run()
+        assert len(sessions) == 2, "the interrupted upload started a new session instead of resuming"
+        assert bytes(sessions['1']) == expected and not os.path.exists(session_path)
+        print("✓ interrupted upload resumed its saved session")
+    finally:
+        RETRY_BASE_DELAY = base_delay
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    check_fake_endpoint()
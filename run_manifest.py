@@ -0,0 +1,95 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+MANIFEST_FILE = "manifest.json"
+
+def file_hash(path):
+    """sha256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class RunManifest:
+    """
+    Record of which inputs produced which outputs in a run folder.
+
+    Each stage stores a key of its inputs (see asset_cache.cache_key) and a
+    content hash of every file it wrote. A stage is up to date when its
+    input key is unchanged and its outputs are still on disk unmodified, the
+    way make decides what to rebuild. Output hashes double as inputs for the
+    stages downstream. Size and mtime are kept with each hash so unchanged
+    files aren't re-read on every check.
+    """
+
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        self.path = os.path.join(run_dir, MANIFEST_FILE)
+        self.stages = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                self.stages = json.load(f).get('stages', {})
+
+    def _entry(self, path):
+        stat = os.stat(path)
+        return {
+            'path': os.path.relpath(path, self.run_dir),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha256': file_hash(path),
+        }
+
+    def _unchanged(self, entry):
+        path = os.path.join(self.run_dir, entry['path'])
+        if not os.path.exists(path):
+            return False
+        stat = os.stat(path)
+        if stat.st_size == entry['size'] and stat.st_mtime == entry['mtime']:
+            return True
+        # Touched but maybe not modified: compare contents
+        return stat.st_size == entry['size'] and file_hash(path) == entry['sha256']
+
+    def is_fresh(self, stage, inputs):
+        """True when `stage` last ran with these inputs and its outputs are intact"""
+        record = self.stages.get(stage)
+        return bool(record) and record['inputs'] == inputs \
+            and all(self._unchanged(entry) for entry in record['outputs'])
+
+    def record(self, stage, inputs, outputs):
+        """Store a finished stage and save the manifest"""
+        self.stages[stage] = {
+            'inputs': inputs,
+            'outputs': [self._entry(path) for path in outputs],
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        self.save()
+
+    def outputs(self, stage):
+        """Paths of the files a stage produced"""
+        return [os.path.join(self.run_dir, entry['path'])
+                for entry in self.stages.get(stage, {}).get('outputs', [])]
+
+    def output_hashes(self, stage):
+        return [entry['sha256'] for entry in self.stages.get(stage, {}).get('outputs', [])]
+
+    def hashes(self, paths):
+        """Content hashes of files, reusing recorded ones for files that haven't changed since"""
+        known = {entry['path']: entry for record in self.stages.values() for entry in record['outputs']}
+        result = []
+        for path in paths:
+            entry = known.get(os.path.relpath(path, self.run_dir))
+            stat = os.stat(path)
+            if entry and stat.st_size == entry['size'] and stat.st_mtime == entry['mtime']:
+                result.append(entry['sha256'])
+            else:
+                result.append(file_hash(path))
+        return result
+
+    def save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({'stages': self.stages}, f, indent=4)
+        os.replace(temp_path, self.path)
@@ -1,17 +1,15 @@
-from openai import OpenAI
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from asset_cache import AssetCache, cache_key
+from instrumentation import METRICS
+from http_clients import shared_openai_client
 import os
 import json
 
-def generate_script(idea):
-    load_dotenv()
-    client = OpenAI()
-    
-    response = client.chat.completions.create(
-        model="gpt-4-0125-preview",
-        messages=[
-            {"role": "system", "content": "You are a creative YouTube Shorts content creator who specializes in creating viral, engaging, family-friendly content."},
-            {"role": "user", "content": f"""Create a structured output for a YouTube Short based on this idea: {idea}
+SCRIPT_MODEL = "gpt-4-0125-preview"
+
+SYSTEM_PROMPT = "You are a creative YouTube Shorts content creator who specializes in creating viral, engaging, family-friendly content."
+
+USER_PROMPT_TEMPLATE = """Create a structured output for a YouTube Short based on this idea: {idea}
             Please provide:
             1. A short, catchy title (2-3 words maximum)
             2. A spoken narrative script (30-60 seconds, only spoken words). End the script with an open-ended question.
@@ -34,16 +32,74 @@ def generate_script(idea):
             Make the title attention-grabbing and relevant to the content.
             Make the image prompts very specific and detailed for best AI generation, no non-english characters. No emojis.
             Keep the script concise and engaging for short-form content.
-            Include trending hashtags in the description along with good keywords for SEO optimization."""}
-        ],
-        max_tokens=1000,
-        response_format={ "type": "json_object" }
-    )
+            Include trending hashtags in the description along with good keywords for SEO optimization."""
+
+# Part of every cache key, so editing the prompts invalidates cached scripts
+PROMPT_TEMPLATE_HASH = cache_key(SYSTEM_PROMPT, USER_PROMPT_TEMPLATE)
+
+SCRIPT_CACHE_MAX_BYTES = int(os.getenv('SCRIPT_CACHE_MAX_BYTES', 100 * 1024**2))
+
+@METRICS.timed('stage.script')
+def generate_script(idea, client=None, model=SCRIPT_MODEL, cache=None):
+    """Generate title, script, image prompts and description for one idea"""
+    key = cache_key(idea, model, PROMPT_TEMPLATE_HASH)
+    if cache is not None:
+        cached_path = cache.get(key)
+        if cached_path:
+            METRICS.add('script.cache_hits')
+            with open(cached_path, 'r') as f:
+                return json.load(f)
+
+    if client is None:
+        client = shared_openai_client()
+    
+    with METRICS.timer('api.script'):
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": USER_PROMPT_TEMPLATE.format(idea=idea)}
+            ],
+            max_tokens=1000,
+            response_format={ "type": "json_object" }
+        )
+    if getattr(response, 'usage', None):
+        METRICS.add('api.script.tokens', response.usage.total_tokens)
     
     # Parse the JSON response
     content = json.loads(response.choices[0].message.content)
+    if cache is not None:
+        cache.put_bytes(key, json.dumps(content).encode('utf-8'))
     return content
 
+def generate_scripts(ideas, max_workers=4, model=SCRIPT_MODEL, use_cache=True):
+    """
+    Generate scripts for many ideas concurrently over one shared client.
+
+    Results come back in the order of `ideas`, with None for ideas that
+    failed. Scripts are memoized on disk by (idea, model, prompt template),
+    so repeated ideas return immediately without an API call.
+    """
+    client = shared_openai_client()
+    cache = AssetCache("scripts", SCRIPT_CACHE_MAX_BYTES, suffix=".json") if use_cache else None
+
+    # Each distinct idea is generated once, even if it's listed twice
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {idea: pool.submit(generate_script, idea, client, model, cache)
+                   for idea in dict.fromkeys(ideas)}
+        scripts = {}
+        for idea, future in futures.items():
+            try:
+                scripts[idea] = future.result()
+            except Exception as e:
+                print(f"Script generation failed for idea '{idea}': {e}")
+                scripts[idea] = None
+    results = [scripts[idea] for idea in ideas]
+
+    if cache is not None:
+        print(cache.report())
+    return results
+
 if __name__ == "__main__":
     # Test the function
     idea = "A hopeful story about entropy"
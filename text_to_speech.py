@@ -1,19 +1,130 @@
-from openai import OpenAI
+from asset_cache import AssetCache, cache_key, link_or_copy
+from audio_utils import AUDIO_FPS, decode_audio, encode_audio, rms, trim_silence, apply_fades
+from instrumentation import METRICS
+from http_clients import shared_openai_client
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import os
+import re
+import json
 
-def generate_audio(script_text, output_dir):
-    client = OpenAI()
-    
+TTS_MODEL = "tts-1"  # or "tts-1-hd" for higher quality
+TTS_VOICE = "nova"   # change this to try different voices
+
+# Synthesized speech is kept across runs, so re-rendering a script is free
+TTS_CACHE_MAX_BYTES = int(os.getenv('TTS_CACHE_MAX_BYTES', 500 * 1024**2))
+
+SENTENCE_GAP = 0.15  # seconds of silence between stitched sentences
+
+@METRICS.timed('stage.tts')
+def generate_audio(script_text, output_dir, model=TTS_MODEL, voice=TTS_VOICE, use_cache=True,
+                   split_sentences=False):
     # Available voices: alloy, echo, fable, onyx, nova, shimmer
     audio_path = os.path.join(output_dir, "tts_audio.mp3")
-    
-    with open(audio_path, 'wb') as f:
-        response = client.audio.speech.create(
-            model="tts-1",  # or "tts-1-hd" for higher quality
-            voice="nova",   # change this to try different voices
-            input=script_text
-        )
-        for chunk in response.iter_bytes():
-            f.write(chunk)
-    
+
+    offsets_path = os.path.join(output_dir, "tts_offsets.json")
+
+    cache = AssetCache("tts", TTS_CACHE_MAX_BYTES, suffix=".mp3") if use_cache else None
+    if split_sentences:
+        # Sentence offsets are kept with the track; a track without them is a miss
+        key = cache_key(script_text, model, voice, 'sentences')
+        companions = (".json",)
+    else:
+        key = cache_key(script_text, model, voice)
+        companions = ()
+    if cache is not None and cache.get(key, companions):
+        print("Using cached TTS audio")
+        METRICS.add('tts.cache_hits')
+        if split_sentences:
+            link_or_copy(cache.companion_path(key, ".json"), offsets_path)
+        return cache.link_to(key, audio_path)
+
+    client = shared_openai_client()
+
+    # The run folder's files may be hard links to cache entries (a hit, or
+    # the put below on an earlier run), so never write into them: write a
+    # new file and move it over the old name
+    temp_path = os.path.join(output_dir, f"tts_audio.{os.getpid()}.tmp.mp3")
+    if split_sentences:
+        _, offsets = synthesize_sentences(client, script_text, temp_path, model, voice)
+        temp_offsets_path = f"{offsets_path}.{os.getpid()}.tmp"
+        with open(temp_offsets_path, "w") as f:
+            json.dump(offsets, f, indent=4)
+        os.replace(temp_offsets_path, offsets_path)
+        if cache is not None:
+            # In place before the track itself, so a stored track always has its offsets
+            link_or_copy(offsets_path, cache.companion_path(key, ".json"))
+    else:
+        with open(temp_path, 'wb') as f, METRICS.timer('api.tts'):
+            response = client.audio.speech.create(
+                model=model,
+                voice=voice,
+                input=script_text
+            )
+            for chunk in response.iter_bytes():
+                f.write(chunk)
+                METRICS.add('api.tts.bytes', len(chunk))
+    os.replace(temp_path, audio_path)
+
+    if cache is not None:
+        cache.put(key, audio_path)
     return audio_path
+
+def split_into_sentences(text):
+    """Split text after ., ! or ? followed by whitespace"""
+    return [s.strip() for s in re.split(r'(?<=[.!?])\s+', text.strip()) if s.strip()]
+
+def synthesize_sentences(client, script_text, audio_path, model=TTS_MODEL, voice=TTS_VOICE,
+                         max_workers=8):
+    """
+    Synthesize each sentence concurrently and stitch them into one track.
+
+    Pieces are trimmed of edge silence, matched to a common loudness, joined
+    with short fades and a fixed gap, and encoded once. Returns the audio
+    path and a list of {sentence, start, end} offsets in seconds.
+    """
+    sentences = split_into_sentences(script_text)
+
+    def synthesize(i):
+        # WAV avoids the encoder padding MP3 adds at both ends of every piece
+        part_path = f"{audio_path}.part{i}.wav"
+        with open(part_path, 'wb') as f, METRICS.timer('api.tts'):
+            response = client.audio.speech.create(model=model, voice=voice, input=sentences[i],
+                                                  response_format="wav")
+            for chunk in response.iter_bytes():
+                f.write(chunk)
+                METRICS.add('api.tts.bytes', len(chunk))
+        try:
+            return decode_audio(part_path)
+        finally:
+            os.remove(part_path)
+
+    print(f"Synthesizing {len(sentences)} sentences concurrently...")
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pieces = [trim_silence(piece) for piece in pool.map(synthesize, range(len(sentences)))]
+
+    # Match every piece to the median loudness so no sentence jumps out
+    levels = [rms(piece) for piece in pieces]
+    target = float(np.median([level for level in levels if level > 0] or [0]))
+
+    gap = np.zeros((int(SENTENCE_GAP * AUDIO_FPS), 2), dtype=np.float32)
+    track, offsets, position = [], [], 0
+    for sentence, piece, level in zip(sentences, pieces, levels):
+        if level > 0:
+            piece = piece * np.clip(target / level, 0.5, 2.0)
+        piece = apply_fades(piece)
+        if track:
+            track.append(gap)
+            position += len(gap)
+        offsets.append({
+            'sentence': sentence,
+            'start': round(position / AUDIO_FPS, 3),
+            'end': round((position + len(piece)) / AUDIO_FPS, 3),
+        })
+        track.append(piece)
+        position += len(piece)
+
+    encode_audio(np.concatenate(track) if track else gap, audio_path)
+    for offset in offsets:
+        print(f"  {offset['start']:6.2f}s  {offset['sentence']}")
+    return audio_path, offsets
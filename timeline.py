@@ -0,0 +1,103 @@
+import math
+import threading
+import numpy as np
+from moviepy.editor import VideoClip
+
+def build_interval_index(intervals, bucket_size):
+    """
+    Index (start, end) intervals into fixed-width time buckets.
+
+    Bucket b lists, in their original order, the intervals overlapping
+    [b * bucket_size, (b + 1) * bucket_size).
+    """
+    n_buckets = max((math.ceil(end / bucket_size) for _, end in intervals), default=0)
+    buckets = [[] for _ in range(n_buckets + 1)]
+    for i, (start, end) in enumerate(intervals):
+        first = int(start // bucket_size)
+        last = max(first, math.ceil(end / bucket_size) - 1)
+        for b in range(first, min(last, n_buckets) + 1):
+            buckets[b].append(i)
+    return buckets
+
+class TimelineCompositor(VideoClip):
+    """
+    Drop-in replacement for CompositeVideoClip on long timelines.
+
+    CompositeVideoClip checks every layer on every frame. Here layers are
+    indexed by start/end time once, so each frame only blits the few layers
+    actually on screen and the per-frame cost does not grow with the number
+    of captions or images. Layers stack in list order, first at the bottom.
+
+    Layers with a draw_into(frame, t) method (see compositing) blend straight
+    into the frame; plain moviepy clips go through their own blit_on.
+
+    Layers with a release() method (see ken_burns.LazyKenBurns) are released
+    once frames are drawn a bucket past their end, so a long timeline only
+    holds the state of what is on screen. Frames are expected in time order,
+    give or take the few frames producer threads work ahead.
+    """
+
+    def __init__(self, clips, size, duration=None, bg_color=(0, 0, 0), bucket_size=1.0):
+        VideoClip.__init__(self)
+        if duration is None:
+            duration = max(clip.end for clip in clips)
+
+        self.clips = clips
+        self.size = size
+        self.duration = duration
+        self.end = duration
+        self.bucket_size = bucket_size
+
+        width, height = size
+        self.bg = np.empty((height, width, 3), dtype=np.uint8)
+        self.bg[:] = bg_color
+
+        # Clips without an end play until the end of the timeline
+        intervals = [(clip.start, clip.end if clip.end is not None else duration)
+                     for clip in clips]
+        self.buckets = build_interval_index(intervals, bucket_size)
+        self.make_frame = self._make_frame
+
+        # Releasable layers by end time
+        self._releasable = sorted((end, i) for i, (_, end) in enumerate(intervals)
+                                  if hasattr(clips[i], 'release'))
+        self._next_release = 0
+        self._release_lock = threading.Lock()
+
+    def layer_boundaries(self):
+        """Sorted times where any layer starts or ends"""
+        times = {0, self.duration}
+        for clip in self.clips:
+            times.add(clip.start)
+            if clip.end is not None:
+                times.add(clip.end)
+        return sorted(t for t in times if 0 <= t <= self.duration)
+
+    def active_clips(self, t):
+        """Clips on screen at time t, bottom layer first"""
+        b = int(t // self.bucket_size)
+        if b < 0 or b >= len(self.buckets):
+            return []
+        return [self.clips[i] for i in self.buckets[b] if self.clips[i].is_playing(t)]
+
+    def release_finished(self, t):
+        """Release layers that ended more than a bucket before t"""
+        with self._release_lock:
+            while (self._next_release < len(self._releasable)
+                   and self._releasable[self._next_release][0] < t - self.bucket_size):
+                self.clips[self._releasable[self._next_release][1]].release()
+                self._next_release += 1
+
+    def frame_into(self, t, out):
+        """Draw the frame at time t into the uint8 array `out`"""
+        self.release_finished(t)
+        np.copyto(out, self.bg)
+        for clip in self.active_clips(t):
+            if hasattr(clip, 'draw_into'):
+                clip.draw_into(out, t)
+            else:
+                np.copyto(out, clip.blit_on(out, t), casting='unsafe')
+        return out
+
+    def _make_frame(self, t):
+        return self.frame_into(t, np.empty_like(self.bg))
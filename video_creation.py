@@ -1,18 +1,29 @@
 import os
 import re
-from moviepy.config import change_settings
-from moviepy.editor import ImageClip, concatenate_videoclips, TextClip, CompositeVideoClip, AudioFileClip, ColorClip, VideoClip
+import time
 import numpy as np
 from text_to_speech import generate_audio
 from datetime import datetime
 from image_sourcing import get_images
 import random
-from moviepy.audio.AudioClip import CompositeAudioClip
-from moviepy.audio.fx.volumex import volumex
+import functools
+from ken_burns import LazyKenBurns, EFFECT_TYPES
+from image_prep import image_size, source_pixels, cover_pixels, FRAME_SIZE
+from caption_renderer import create_text_layer, scale_style, CAPTION_STYLE, TITLE_STYLE
+from compositing import ImageLayer, ColorLayer
+from timeline import TimelineCompositor
+from parallel_render import render_parallel
+from frame_pipeline import write_video
+from music_library import MusicLibrary
+from audio_utils import AUDIO_FPS, decode_audio
+from audio_mixing import mix_audio
+from instrumentation import METRICS
 
-# Add this after imports
-if os.name == 'nt':  # for Windows
-    change_settings({"IMAGEMAGICK_BINARY": r"C:\Program Files\ImageMagick-7.1.1-Q16-HDRI\magick.exe"})
+# Full quality render, and a fast draft with the same timeline for reviewing
+# scripts and caption styles. scale applies to the 1080x1920 frame; the rest
+# are libx264 settings (crf, when set, replaces bitrate).
+RENDER_SETTINGS = dict(scale=1.0, fps=30, bitrate="4000k", preset="medium", crf=None, threads=None)
+PREVIEW_SETTINGS = dict(scale=0.5, fps=15, bitrate="800k", preset="ultrafast", crf=None, threads=None)
 
 def count_syllables(word):
     # A very basic syllable counting heuristic
@@ -42,127 +53,128 @@ def split_script_by_syllables(script_text, syllables_per_chunk=10):
 
     return chunks
 
-def create_dynamic_image_clip(img_url, duration, width, height):
-    """Create an image clip with random pan and zoom effects"""
-    img_clip = ImageClip(img_url)
-    
-    # Calculate resize dimensions to maintain aspect ratio
-    aspect_ratio = img_clip.w / img_clip.h
-    if aspect_ratio > width/height:  # too wide
-        new_h = height
-        new_w = int(height * aspect_ratio)
-    else:  # too tall
-        new_w = width
-        new_h = int(width / aspect_ratio)
-        
-    # Resize image larger than needed to allow for movement
-    scale_factor = 1.5  # Scale up by 50% to allow room for movement
-    img_clip = img_clip.resize((int(new_w * scale_factor), int(new_h * scale_factor)))
-    
+def create_dynamic_image_clip(img_url, duration, width, height, fps=30, rng=random, start=0,
+                              crossfade=0.0):
+    """Create an image layer with random pan and zoom effects"""
     # Randomly choose effect type
-    effect_type = random.choice(['zoom_in', 'zoom_out', 'pan_left', 'pan_right', 'pan_up', 'pan_down'])
+    effect_type = rng.choice(EFFECT_TYPES)
     
-    def get_frame(t):
-        progress = t / duration  # 0 to 1
-        
-        if effect_type == 'zoom_in':
-            zoom = 1 - (0.3 * progress)  # Start at 100%, end at 70%
-            pos_x = (img_clip.w - width) // 2
-            pos_y = (img_clip.h - height) // 2
-            
-        elif effect_type == 'zoom_out':
-            zoom = 0.7 + (0.3 * progress)  # Start at 70%, end at 100%
-            pos_x = (img_clip.w - width) // 2
-            pos_y = (img_clip.h - height) // 2
-            
-        elif effect_type == 'pan_left':
-            zoom = 1
-            pos_x = int((img_clip.w - width) * (1 - progress))
-            pos_y = (img_clip.h - height) // 2
-            
-        elif effect_type == 'pan_right':
-            zoom = 1
-            pos_x = int((img_clip.w - width) * progress)
-            pos_y = (img_clip.h - height) // 2
-            
-        elif effect_type == 'pan_up':
-            zoom = 1
-            pos_x = (img_clip.w - width) // 2
-            pos_y = int((img_clip.h - height) * (1 - progress))
-            
-        else:  # pan_down
-            zoom = 1
-            pos_x = (img_clip.w - width) // 2
-            pos_y = int((img_clip.h - height) * progress)
-        
-        # Apply zoom
-        zoomed = img_clip.resize(zoom)
-        
-        # Ensure we don't go out of bounds
-        pos_x = max(0, min(pos_x, zoomed.w - width))
-        pos_y = max(0, min(pos_y, zoomed.h - height))
-        
-        # Crop the frame
-        frame = zoomed.crop(x1=pos_x, y1=pos_y, width=width, height=height)
-        return frame.get_frame(t)
+    # Pixels are memory-mapped from the run's prepared/ folder and shared by
+    # every clip of the same image, so nothing is decoded or resized again:
+    # pans slice a copy already scaled for this frame size, zooms resample
+    # the visible region of the original
+    if effect_type in ('zoom_in', 'zoom_out'):
+        load_pixels = functools.partial(source_pixels, img_url)
+    else:
+        load_pixels = functools.partial(cover_pixels, img_url, width, height)
+    frames = LazyKenBurns(load_pixels, width, height, duration, fps=fps, effect_type=effect_type,
+                          source_size=image_size(img_url))
     
-    return VideoClip(get_frame, duration=duration)
+    # Nothing is loaded until the clip's first frame; the timeline releases
+    # it again once it's past (see TimelineCompositor)
+    return ImageLayer(frames, start, duration, crossfade=crossfade)
 
-def create_video(images, script_text, output_dir, title):
+@METRICS.timed('stage.render')
+def create_video(images, script_text, output_dir, title, render_workers=1, audio_path=None,
+                 duck_music=False, preview=False, preview_duration=None, frame_threads=2,
+                 encoder=None):
     # Get current timestamp
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # encoder overrides individual settings, e.g. {'preset': 'fast', 'crf': 20}
+    settings = dict(PREVIEW_SETTINGS if preview else RENDER_SETTINGS,
+                    **{k: v for k, v in (encoder or {}).items() if v is not None})
+    encoder_settings = dict(codec='libx264', bitrate=settings['bitrate'], preset=settings['preset'],
+                            crf=settings['crf'], threads=settings['threads'])
     
-    # Create filename with timestamp
-    output_filename = f"video_{timestamp}.mp4"
+    # Create filename with timestamp; previews are never picked up for upload
+    output_filename = f"{'preview' if preview else 'video'}_{timestamp}.mp4"
     output_path = os.path.join(output_dir, output_filename)
 
-    # Generate audio using OpenAI TTS
-    audio_filename = generate_audio(script_text, output_dir)
-    voice_clip = AudioFileClip(audio_filename)
-    tts_duration = voice_clip.duration
+    # Use pre-generated narration if given, otherwise generate audio using OpenAI TTS
+    audio_filename = audio_path or generate_audio(script_text, output_dir)
+    setup_start = time.perf_counter()
+    voice = decode_audio(audio_filename)
+    tts_duration = len(voice) / AUDIO_FPS
+
+    # A capped preview keeps the full-length timing and just stops early
+    render_duration = tts_duration
+    if preview and preview_duration:
+        render_duration = min(tts_duration, preview_duration)
+        voice = voice[:int(render_duration * AUDIO_FPS)]
 
-    # Get random background music
-    songs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "songs")
-    song_files = [f for f in os.listdir(songs_dir) if f.endswith(('.mp3', '.wav', '.m4a'))]
+    # Get random background music from the pre-decoded library
+    library = MusicLibrary()
+    library.refresh()
+    track = library.choose()
     
-    if song_files:
-        # Pick a random song
-        chosen_song = random.choice(song_files)
-        song_path = os.path.join(songs_dir, chosen_song)
-        print(f"Using background music: {chosen_song}")
-        
-        # Load and adjust background music
-        background_music = AudioFileClip(song_path)
-        
-        # Loop the background music if it's shorter than the video
-        if background_music.duration < tts_duration:
-            loops_needed = int(tts_duration / background_music.duration) + 1
-            background_music = CompositeAudioClip([
-                background_music.set_start(i * background_music.duration)
-                for i in range(loops_needed)
-            ])
-        
-        # Trim background music to video length
-        background_music = background_music.set_duration(tts_duration)
-        
-        # Adjust volumes
-        voice_clip = voice_clip.volumex(1.0)  # Keep voice at 100%
-        background_music = background_music.volumex(0.1)  # Reduce background to 10%
-        
-        # Combine audio tracks
-        final_audio = CompositeAudioClip([background_music, voice_clip])
+    music = None
+    if track:
+        print(f"Using background music: {track['file']}")
+        # Loop and trim the background music to the narration length
+        music = library.samples_for(track, len(voice))
     else:
-        final_audio = voice_clip
         print("No background music files found in the songs directory.")
 
+    # Mix voice at 100% and music at 10% into the one track the muxer copies
+    final_audio_path = os.path.join(output_dir, f"final_audio_{timestamp}.m4a")
+    mix_audio(voice, final_audio_path, music=music, voice_gain=1.0, music_gain=0.1,
+              duck=duck_music)
+    METRICS.observe('render.audio', time.perf_counter() - setup_start)
+
+    fps = settings['fps']
+
+    # Everything needed to rebuild the exact same timeline, including the
+    # random effect choices, so render workers can build their own copy
+    timeline_args = dict(
+        images=images,
+        script_text=script_text,
+        title=title,
+        duration=tts_duration,
+        fps=fps,
+        seed=random.randrange(2**32),
+        scale=settings['scale'],
+        max_duration=render_duration
+    )
+
+    if render_workers > 1:
+        render_parallel(build_timeline, timeline_args, final_audio_path, output_path,
+                        fps=fps, workers=render_workers, **encoder_settings)
+    else:
+        with METRICS.timer('render.setup'):
+            final_video = build_timeline(**timeline_args)
+        
+        # Draw frames on producer threads while ffmpeg encodes; the mixed
+        # track is muxed in as is
+        write_video(final_video, output_path, fps, audio_path=final_audio_path,
+                    producers=frame_threads, **encoder_settings)
+    
+    os.remove(final_audio_path)
+    
+    # Clean up the audio file after video is created, unless the caller owns it
+    if audio_path is None:
+        os.remove(audio_filename)
+    return output_path
+
+def build_timeline(images, script_text, title, duration, fps=30, seed=None, scale=1.0,
+                   max_duration=None):
+    """
+    Build the silent video timeline: pan/zoom images, captions and title.
+
+    Layout is defined at 1080x1920 and multiplied by `scale`, so a preview is
+    the same timeline at a lower resolution. `max_duration` cuts the timeline
+    short without changing when anything happens.
+    """
+    rng = random.Random(seed)
     image_duration = 10
 
-    # Set dimensions for YouTube Shorts (9:16 aspect ratio)
-    width = 1080
-    height = 1920
+    # Set dimensions for YouTube Shorts (9:16 aspect ratio); even for libx264
+    width = int(FRAME_SIZE[0] * scale) // 2 * 2
+    height = int(FRAME_SIZE[1] * scale) // 2 * 2
+    caption_style = scale_style(CAPTION_STYLE, scale)
+    title_style = scale_style(TITLE_STYLE, scale)
 
     # Calculate how many images we need based on audio duration
-    total_duration = tts_duration
+    total_duration = duration
     clips_needed = int(total_duration / (image_duration - 0.5)) + 1
     
     # Create a loop of images by repeating the list as needed
@@ -175,33 +187,17 @@ def create_video(images, script_text, output_dir, title):
     clips = []
     transition_duration = 0.5  # Half second transition
     
-    for img_url in looped_images:
-        # Create dynamic clip with pan/zoom effect
-        img_clip = create_dynamic_image_clip(img_url, image_duration, width, height)
-        
-        # Add fade in and fade out
-        img_clip = (img_clip
-                   .crossfadein(transition_duration)
-                   .crossfadeout(transition_duration))
-        
-        clips.append(img_clip)
-    
-    # Overlap the clips slightly to create smooth transitions
-    final_clips = []
-    for i, clip in enumerate(clips):
-        if i > 0:  # Not the first clip
-            clip = clip.set_start(i * (image_duration - transition_duration))
-        else:  # First clip
-            clip = clip.set_start(0)
-        final_clips.append(clip)
+    for i, img_url in enumerate(looped_images):
+        # Create dynamic clip with pan/zoom effect; neighbours overlap
+        # slightly and crossfade into each other
+        clips.append(create_dynamic_image_clip(img_url, image_duration, width, height, fps=fps,
+                                               rng=rng, start=i * (image_duration - transition_duration),
+                                               crossfade=transition_duration))
 
-    # Create base video with transitions
-    video = CompositeVideoClip(final_clips, size=(width, height)).set_duration(tts_duration)
-    
     # Split script into chunks by syllables
     chunks = split_script_by_syllables(script_text, syllables_per_chunk=10)
     total_chunks = len(chunks)
-    chunk_duration = tts_duration / total_chunks  # More precise duration calculation
+    chunk_duration = duration / total_chunks  # More precise duration calculation
 
     # Format text for better visibility in vertical format
     # Break long lines into shorter ones (around 30 chars)
@@ -230,79 +226,26 @@ def create_video(images, script_text, output_dir, title):
         # Add a small delay to text appearance (e.g., 0.2 seconds)
         delayed_start = start_time + 0.2
         
-        # Create high-res outline clip with wider canvas
-        outline_clip = TextClip(
-            formatted_text, 
-            fontsize=200,
-            color='black',
-            font='Verdana-Bold',
-            stroke_color='black',
-            stroke_width=24,
-            size=(width*3, height*2),
-            method='caption',
-            align='center'
-        ).resize(0.27)
-        
-        # Create high-res text clip with turquoise color
-        text_clip = TextClip(
-            formatted_text, 
-            fontsize=200,
-            color='#40E0D0',  # Turquoise color
-            font='Verdana-Bold',
-            stroke_color='black',
-            stroke_width=10,
-            size=(width*3, height*2),
-            method='caption',
-            align='center'
-        ).resize(0.27)
-        
-        # Combine and position
-        combined_clip = CompositeVideoClip([outline_clip, text_clip])
-        return combined_clip.set_position(('center', 900))\
-                          .set_start(delayed_start)\
-                          .set_duration(chunk_duration - 0.2)  # Adjust duration to account for delay
+        # Draw outlined caption in-process at output resolution
+        # (same footprint as the old 3240x3840 canvas shrunk by 0.27)
+        canvas_size = (int(width*3*0.27), int(height*2*0.27))
+        canvas_pos = ((width - canvas_size[0]) // 2, int(900 * scale))
+        # Duration is shortened by the delay
+        return create_text_layer(formatted_text, caption_style, canvas_size, canvas_pos,
+                                 delayed_start, chunk_duration - 0.2)
 
-    # Create high-res title clips with turquoise color and bigger dimensions
-    title_outline = TextClip(
-        title,
-        fontsize=400,
-        color='black',
-        font='Verdana-Bold',
-        stroke_color='black',
-        stroke_width=48,  # Increased outline thickness
-        size=(width*3, height*2),
-        method='caption',
-        align='center'
-    ).resize(0.3)  # Increased size from 0.225 to 0.3
+    # Title canvas matches the old 3240x3840 canvas shrunk by 0.3
+    title_canvas = (int(width*3*0.3), int(height*2*0.3))
     
-    title_text = TextClip(
-        title,
-        fontsize=400,
-        color='#40E0D0',  # Turquoise color
-        font='Verdana-Bold',
-        stroke_color='black',
-        stroke_width=20,  # Slightly thicker inner stroke
-        size=(width*3, height*2),
-        method='caption',
-        align='center'
-    ).resize(0.3)  # Increased size to match outline
-    
-    # Combine and position title with fade in and bounce effect
-    title_clip = CompositeVideoClip([title_outline, title_text])\
-        .set_position(('center', -100))\
-        .set_start(0)\
-        .set_duration(5)\
-        .fadein(0.5)\
-        .fadeout(1)  # Fade out over 1 second
+    # Position title with fade in and bounce effect
+    title_clip = create_text_layer(title, title_style, title_canvas,
+                                   ((width - title_canvas[0]) // 2, int(-100 * scale)),
+                                   start=0, duration=5,
+                                   fade_in=0.5, fade_out=1)  # Fade out over 1 second
 
     # Optional: Add a semi-transparent black background behind the title
-    title_bg = ColorClip(size=(width, 200), color=(0,0,0))\
-        .set_opacity(0.3)\
-        .set_position(('center', -100))\
-        .set_start(0)\
-        .set_duration(5)\
-        .fadein(0.5)\
-        .fadeout(1)
+    title_bg = ColorLayer((0, 0, 0), size=(width, int(200 * scale)), pos=(0, int(-100 * scale)),
+                          start=0, duration=5, opacity=0.3, fade_in=0.5, fade_out=1)
 
     # Create text clips with more precise timing
     text_clips = []
@@ -310,34 +253,26 @@ def create_video(images, script_text, output_dir, title):
         start_time = i * chunk_duration
         text_clips.append(create_text_clip(chunk, start_time, chunk_duration))
 
-    # Update final composition to include title background
-    final_video = CompositeVideoClip(
-        [video] + text_clips + [title_bg, title_clip],
-        size=(width, height)
+    # Compose images, captions and title on one time-indexed timeline
+    # so each frame only touches the layers on screen
+    return TimelineCompositor(
+        clips + text_clips + [title_bg, title_clip],
+        size=(width, height),
+        duration=min(duration, max_duration or duration)
     )
-    final_video = final_video.set_audio(final_audio)
-    
-    # Save with higher quality settings
-    final_video.write_videofile(output_path, fps=30, codec='libx264', bitrate="4000k")
-    
-    # Clean up the audio file after video is created
-    os.remove(audio_filename)
-    return output_path
 
 if __name__ == "__main__":
-    from image_sourcing import get_images
+    # Quick offline render with synthetic images and narration; benchmark.py
+    # sweeps lengths, image counts and caption density
+    from benchmark import synthetic_images, narration_track, synthetic_script
     
     # Create test output directory
     output_dir = os.path.join("output_videos", datetime.now().strftime("%Y%m%d_%H%M%S"))
     os.makedirs(output_dir, exist_ok=True)
     
-    # Get images using image_sourcing
-    test_prompts = [
-        "sunset beach",
-        "mountain landscape", 
-        "cityscape at night"
-    ]
-    images, _ = get_images(test_prompts, output_dir)
+    images = synthetic_images(3, os.path.join(output_dir, "images"))
+    audio_path = narration_track(10, os.path.join(output_dir, "tts_audio.mp3"))
     
-    script_text = "This is the video script text."
-    create_video(images, script_text, output_dir, "Test Title")
\ No newline at end of file
+    script_text = synthetic_script(10, 2.5)
+    print("Video saved to:", create_video(images, script_text, output_dir, "Test Title",
+                                          audio_path=audio_path, preview=True))
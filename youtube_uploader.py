@@ -1,22 +1,39 @@
 from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+from google.auth.transport.requests import Request, AuthorizedSession
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from resumable_upload import ResumableUpload, DEFAULT_CHUNK_SIZE, UPLOAD_URL, print_progress
 import pickle
 import os
 import json
+import threading
 
 class YouTubeUploader:
+    """
+    Long-lived uploader: credentials, the API service and the HTTP session
+    are set up once and reused for every upload, re-authenticating only when
+    the token has expired. Use shared_youtube_uploader() to share one.
+    """
+
     def __init__(self):
         self.SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
         self.API_SERVICE_NAME = 'youtube'
         self.API_VERSION = 'v3'
         self.CLIENT_SECRETS_FILE = "client_secrets.json"  # You'll need to create this
         self.credentials = None
+        self._service = None
+        self._session = None
+        self._lock = threading.Lock()
+
+    def load_credentials(self):
+        with self._lock:
+            return self._load_credentials()
+
+    def _load_credentials(self):
+        if self.credentials and self.credentials.valid:
+            return self.credentials
 
-    def authenticate(self):
         # Load existing credentials if available
-        if os.path.exists('token.pickle'):
+        if self.credentials is None and os.path.exists('token.pickle'):
             with open('token.pickle', 'rb') as token:
                 self.credentials = pickle.load(token)
 
@@ -28,15 +45,42 @@ class YouTubeUploader:
                 flow = InstalledAppFlow.from_client_secrets_file(
                     self.CLIENT_SECRETS_FILE, self.SCOPES)
                 self.credentials = flow.run_local_server(port=0)
+                # New credentials object, so rebuild what used the old one
+                self._service = None
+                self._session = None
 
             # Save the credentials for the next run
             with open('token.pickle', 'wb') as token:
                 pickle.dump(self.credentials, token)
 
-        return build(self.API_SERVICE_NAME, self.API_VERSION, credentials=self.credentials)
+        return self.credentials
 
-    def upload_video(self, video_path, title, description, tags=None, privacy_status="private"):
-        youtube = self.authenticate()
+    def authenticate(self):
+        """The YouTube API service, built once"""
+        credentials = self.load_credentials()
+        with self._lock:
+            if self._service is None:
+                self._service = build(self.API_SERVICE_NAME, self.API_VERSION, credentials=credentials)
+            return self._service
+
+    def session(self):
+        """Authorized HTTP session, kept open so connections are reused between uploads"""
+        credentials = self.load_credentials()
+        with self._lock:
+            if self._session is None:
+                # Refreshes the token by itself when it expires mid-batch
+                self._session = AuthorizedSession(credentials)
+            return self._session
+
+    def upload_video(self, video_path, title, description, tags=None, privacy_status="private",
+                     session_path=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=print_progress,
+                     upload_url=UPLOAD_URL):
+        """
+        Upload in chunks, retrying transient errors. With session_path, the
+        upload session is saved there and a rerun resumes where it stopped.
+        upload_url can point at a test endpoint (see resumable_upload).
+        """
+        session = self.session()
         
         body = {
             'snippet': {
@@ -51,23 +95,35 @@ class YouTubeUploader:
             }
         }
 
-        insert_request = youtube.videos().insert(
-            part=','.join(body.keys()),
-            body=body,
-            media_body=MediaFileUpload(
-                video_path, 
-                chunksize=-1, 
-                resumable=True
-            )
+        upload = ResumableUpload(
+            session,
+            video_path,
+            body,
+            upload_url=upload_url,
+            params={'part': ','.join(body.keys())},
+            session_path=session_path,
+            chunk_size=chunk_size,
+            progress=progress
         )
 
         print(f"Uploading: {title}")
-        response = insert_request.execute()
+        response = upload.run()
         video_id = response['id']
         print(f"Upload Complete! Video ID: {video_id}")
         print(f"Video URL: https://youtu.be/{video_id}")
         return video_id
 
+_shared_uploader = None
+_shared_lock = threading.Lock()
+
+def shared_youtube_uploader():
+    """One YouTubeUploader per process, shared by every upload"""
+    global _shared_uploader
+    with _shared_lock:
+        if _shared_uploader is None:
+            _shared_uploader = YouTubeUploader()
+        return _shared_uploader
+
 def extract_hashtags(description):
     """Extract hashtags from description text"""
     # Find all words that start with #
@@ -76,8 +132,9 @@ def extract_hashtags(description):
     tags = [tag[1:] for tag in hashtags]
     return tags
 
-def upload_to_youtube(video_path, content_dir, privacy_status="private"):
-    """Helper function to upload a video using content from its directory"""
+def upload_to_youtube(video_path, content_dir, privacy_status="private", progress=print_progress,
+                      raise_errors=False, upload_url=UPLOAD_URL):
+    """Helper function to upload a video using content from its directory; returns the video ID"""
     
     # Load content.json for title and description
     with open(os.path.join(content_dir, "content.json"), 'r') as f:
@@ -91,18 +148,24 @@ def upload_to_youtube(video_path, content_dir, privacy_status="private"):
     tags = extract_hashtags(description)
     print(f"Using tags: {tags}")
 
-    # Initialize uploader and upload video
-    uploader = YouTubeUploader()
+    # Reuse the authenticated uploader across videos
+    uploader = shared_youtube_uploader()
     try:
         video_id = uploader.upload_video(
             video_path=video_path,
             title=content['title'],
             description=description,
             tags=tags,
-            privacy_status=privacy_status  # Use the provided privacy status
+            privacy_status=privacy_status,  # Use the provided privacy status
+            # A crashed upload resumes from here on the next upload-only run
+            session_path=os.path.join(content_dir, "youtube_upload_session.json"),
+            progress=progress,
+            upload_url=upload_url
         )
         return video_id
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Upload failed: {str(e)}")
         return None
 